@@ -2,4 +2,10 @@ __version__ = '5c2219ab'
 __author__ = 'nosoyyo'
 
 
-from .bees import AbstractBee
+def __getattr__(name):
+    # AbstractBee comes with requests & co., only load it when asked for
+    if name == 'AbstractBee':
+        from .bees import AbstractBee
+        globals()[name] = AbstractBee
+        return AbstractBee
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
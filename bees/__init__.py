@@ -1,4 +1,25 @@
 __version__ = '5c2219ab'
 __author__ = 'nosoyyo'
 
-from .abstractbee import AbstractBee
+# submodules load on first use, see utils/__init__.py
+_LAZY = {
+    'AbstractBee': '.abstractbee',
+    'ZBee': '.zbee',
+    'AsyncZBee': '.azbee',
+    'ZBeeHive': '.zbee',
+}
+
+__all__ = list(_LAZY)
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    from importlib import import_module
+    value = getattr(import_module(_LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
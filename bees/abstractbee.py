@@ -5,26 +5,60 @@ import os
 import json
 import time
 import requests
-from bs4 import BeautifulSoup
+import http.client
+from urllib.parse import urlsplit, urljoin
+from contextlib import asynccontextmanager
+from requests.adapters import HTTPAdapter
+from requests.cookies import MockRequest, MockResponse
+from requests.cookies import RequestsCookieJar, merge_cookies, get_cookie_header
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from .exceptions import BumbleBeeError
-from .utils import GeneralResp, slowDown, sigmaActions
+from .utils import GeneralResp, buildResponse, slowDown, sigmaActions
+from .utils.soup import cookSoup
+from .utils.download import DownloadStats, splitRange
+from .utils.download import loadPartial, savePartial, dropPartial, resumeMode
 
 
 class AbstractBee():
     '''
     Gerenralized micro agent. 
 
-    :method _SOUP: return BeautifulSoup(resp.text)
-    :method _DOWNLOAD: return bytes or save file_name to local storage.
+    :method _SOUP: return BeautifulSoup(resp.content) or lxml.html tree
+    :method _DOWNLOAD: return bytes or stream file_name to local storage.
+
+    every method above has an `async` twin prefixed with `_A`,
+    e.g. `await bee._AGET(url)`, and `await bee.gather(urls)` fetches
+    many at once, never more than ASYNC_CONCURRENCY in flight per bee
+    and ASYNC_PER_HOST per host.
     '''
 
-    def __init__(self, cookies_file=None, cookies_dict=None):
+    ASYNC_CONCURRENCY = 16
+    ASYNC_PER_HOST = 4
+
+    # connections kept per host by self.s, grown by fetch_many
+    POOL_SIZE = 10
+
+    CHUNK_SIZE = 1024 * 1024
+
+    # parsed pages by body hash, e.g. utils.soup.SOUPS; off by default,
+    # cached trees are shared and a caller changing one changes them all
+    soup_cache = None
+
+    # a HostLimiter of its own, otherwise safecheck.LIMITER is shared
+    limiter = None
 
-    
+    def __init__(self, cookies_file=None, cookies_dict=None, cache=None):
+        '''
+        :param cache: <ResponseCache> makes _GET/_XGET/_SOUP serve fresh
+                      copies from it and revalidate stale ones
+        '''
         self.cookies = {}
         self.headers = {}
+        self.cache = cache
         self.s = requests.Session()
+        self._pool_size = 0
+        self._tunePool(self.POOL_SIZE)
 
     # TODO
     def detectCookiesExpire(self):
@@ -37,6 +71,61 @@ class AbstractBee():
         except Exception:
             return False
 
+    def _tunePool(self, size: int):
+        '''
+        make self.s keep at least `size` connections per host.
+        '''
+        if size > self._pool_size:
+            old = {id(a): a for a in (self.s.adapters.get('http://'),
+                                      self.s.adapters.get('https://')) if a}
+            adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+            self.s.mount('http://', adapter)
+            self.s.mount('https://', adapter)
+            self._pool_size = size
+            # or their pooled connections stay open until gc
+            for previous in old.values():
+                previous.close()
+
+    def fetch_many(self,
+                   urls,
+                   method: str = 'GET',
+                   workers: int = 8,
+                   ordered: bool = True,
+                   **kwargs):
+        '''
+        Run many requests on a thread pool, all sharing self.s:
+        its connection pool and cookie jar are locked, nothing else
+        is written to it per request.
+
+        :return: generator, of results in the order of `urls` if ordered,
+                 else of (url, result) as they complete.
+                 a failed one comes back as its exception
+
+        :param method: <str> `GET`, `XGET`, `POST`, `SOUP` or `DOWNLOAD`
+        :param workers: <int> threads, and connections kept per host
+        :param kwargs: passed to every single call
+        '''
+        urls = list(urls)
+        fetch = getattr(self, f'_{method.upper()}')
+        self._tunePool(workers)
+
+        def one(url):
+            try:
+                return fetch(url, **kwargs)
+            except Exception as e:
+                return e
+
+        pool = ThreadPoolExecutor(workers)
+        try:
+            if ordered:
+                yield from pool.map(one, urls)
+            else:
+                futures = {pool.submit(one, url): url for url in urls}
+                for future in as_completed(futures):
+                    yield futures[future], future.result()
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
     def _checkUA(self, headers: dict) -> dict:
         ua = 'User-Agent'
         if ua not in headers.keys() and ua.lower() not in headers.keys():
@@ -44,7 +133,6 @@ class AbstractBee():
 AppleWebKit/537.36 (KHTML, like Gecko) Chrome/71.0.3578.98 Safari/537.36'
         return headers
 
-    @slowDown
     def _GET(self,
              url: str,
              headers={},
@@ -53,11 +141,26 @@ AppleWebKit/537.36 (KHTML, like Gecko) Chrome/71.0.3578.98 Safari/537.36'
         '''
         :param _params: <dict>
         '''
-        resp = None
         headers = headers or self.headers.copy()
         headers = self._checkUA(headers)
         _params = _params or {}
 
+        if self.cache is not None and 'file' not in kwargs:
+            resp = self.cache.fetch(url, _params, headers, self._get)
+        else:
+            resp = self._get(url, headers, _params)
+
+        if 'file' in kwargs:
+            return resp.content
+        else:
+            return GeneralResp(resp)
+
+    @slowDown
+    def _get(self, url: str, headers: dict, _params: dict):
+        '''
+        the request that really goes out, cache or not.
+        '''
+        resp = None
         try:
             occur = time.time()
             resp = self.s.get(url, cookies=self.cookies,
@@ -66,11 +169,7 @@ AppleWebKit/537.36 (KHTML, like Gecko) Chrome/71.0.3578.98 Safari/537.36'
             print(f'some {e} happens during _GET')
         finally:
             sigmaActions(occur)
-
-        if 'file' in kwargs:
-            return resp.content
-        else:
-            return GeneralResp(resp)
+        return resp
 
     @slowDown
     def _POST(self, url: str, headers=None, _data=None, _params=None):
@@ -123,30 +222,368 @@ AppleWebKit/537.36 (KHTML, like Gecko) Chrome/71.0.3578.98 Safari/537.36'
 
         return GeneralResp(resp)
 
-    def _SOUP(self, url: str):
+    def _SOUP(self, url: str, mode: str = 'soup', only=None):
+        '''
+        :param mode: <str> `soup` for BeautifulSoup, `lxml` for lxml.html
+        :param only: parse just this, see utils.soup.cookSoup
+        '''
         print(f'cooking soup from {url}...')
         resp = self._GET(url)
         if resp:
             print('soup ready.')
-            return BeautifulSoup(resp._content.decode(), 'lxml')
+            return cookSoup(resp._content, resp.headers,
+                            mode=mode, only=only, cache=self.soup_cache)
 
-    def _DOWNLOAD(self, url: str, file_name=None):
+    def _DOWNLOAD(self,
+                  url: str,
+                  file_name=None,
+                  chunk_size: int = None,
+                  resume: bool = False,
+                  segments: int = 1):
         '''
-        use this method to download files
+        use this method to download files, streamed to disk chunk by chunk
+
+        :return: bytes if no file_name, else <DownloadStats>
 
         :param file_name: return binary content if None
+        :param chunk_size: <int> bytes per write, CHUNK_SIZE by default
+        :param resume: <bool> go on from where an earlier resume=True call
+                              on the same url & file_name stopped, as long
+                              as the server says the content is unchanged;
+                              otherwise file_name is written over
+        :param segments: <int> fetch that many ranges in parallel if the
+                               server supports them; no resuming then
         '''
-        started = time.time()
-        resp = self._GET(url, file=True)
         if not file_name:
-            return resp
+            return self._GET(url, file=True)
+
+        chunk_size = chunk_size or self.CHUNK_SIZE
+        headers = self._checkUA(self.headers.copy())
+        # a compressed stream can not be resumed nor split
+        headers['Accept-Encoding'] = 'identity'
+
+        if segments > 1:
+            length = self._rangesSupported(url, headers)
+            if length:
+                # a torn segmented file must never look resumable
+                dropPartial(file_name)
+                return self._downloadSegments(url, file_name, headers,
+                                              length, chunk_size, segments)
+
+        known = self._resumeHeaders(url, file_name, headers, resume)
+        stats = DownloadStats(url, file_name,
+                              resumed_from=known['offset'] if known else 0)
+
+        with self._stream(url, headers) as resp:
+            mode = resumeMode(resp.status_code, resp.headers, known) \
+                if known else 'wb'
+            if mode not in ('done', 'again'):
+                resp.raise_for_status()
+                self._beginWrite(url, file_name, resp.headers, mode,
+                                 resume, stats)
+                with open(file_name, mode) as f:
+                    for chunk in resp.iter_content(chunk_size):
+                        f.write(chunk)
+                        stats.received += len(chunk)
+
+        if mode == 'again':
+            dropPartial(file_name)
+            return self._DOWNLOAD(url, file_name, chunk_size, resume)
+        dropPartial(file_name)
+        return stats.done(os.path.getsize(file_name))
+
+    @staticmethod
+    def _resumeHeaders(url, file_name, headers, resume) -> dict:
+        '''
+        add `Range` & `If-Range` if there's a partial file to go on from.
+
+        :return: <dict> what's known of it, see utils.download.loadPartial
+        '''
+        known = loadPartial(file_name, url) if resume else None
+        if known:
+            headers['Range'] = f'bytes={known["offset"]}-'
+            headers['If-Range'] = known['validator']
+        return known
+
+    @staticmethod
+    def _beginWrite(url, file_name, headers, mode, resume, stats):
+        if mode == 'wb':
+            stats.resumed_from = 0
+            if resume:
+                savePartial(file_name, url, headers)
+
+    @slowDown
+    def _stream(self, url: str, headers: dict):
+        occur = time.time()
+        try:
+            return self.s.get(url, cookies=self.cookies,
+                              headers=headers, stream=True)
+        finally:
+            sigmaActions(occur)
+
+    def _rangesSupported(self, url: str, headers: dict) -> int:
+        '''
+        :return: <int> content length if byte ranges are served, else 0
+        '''
+        try:
+            resp = self.s.head(url, cookies=self.cookies,
+                               headers=headers, allow_redirects=True)
+            if resp.headers.get('Accept-Ranges', '').lower() != 'bytes':
+                return 0
+            return int(resp.headers.get('Content-Length', 0))
+        except (requests.RequestException, ValueError):
+            return 0
+
+    def _downloadSegments(self, url, file_name, headers,
+                          length, chunk_size, segments) -> DownloadStats:
+        ranges = splitRange(length, segments)
+        stats = DownloadStats(url, file_name, segments=len(ranges))
+        with open(file_name, 'wb') as f:
+            f.truncate(length)
+
+        def fetch(start, end):
+            received = 0
+            _headers = dict(headers, Range=f'bytes={start}-{end}')
+            with self._stream(url, _headers) as resp:
+                if resp.status_code != 206:
+                    raise BumbleBeeError(1005)
+                with open(file_name, 'r+b') as f:
+                    f.seek(start)
+                    for chunk in resp.iter_content(chunk_size):
+                        f.write(chunk)
+                        received += len(chunk)
+            return received
+
+        with ThreadPoolExecutor(len(ranges)) as pool:
+            for received in pool.map(lambda r: fetch(*r), ranges):
+                stats.received += received
+
+        return stats.done(os.path.getsize(file_name))
+
+    # async twins
+
+    def _asyncSession(self):
+        '''
+        aiohttp session & semaphores belong to one event loop,
+        so they get rebuilt whenever the running loop changes.
+        '''
+        # asyncio & aiohttp only load for bees that go async
+        import asyncio
+        loop = asyncio.get_running_loop()
+        if getattr(self, '_aloop', None) is not loop:
+            import aiohttp
+            connector = aiohttp.TCPConnector(
+                limit=self.ASYNC_CONCURRENCY,
+                limit_per_host=self.ASYNC_PER_HOST)
+            self._aloop = loop
+            # self.s's jar is the one jar, see _asyncOpen
+            self._as = aiohttp.ClientSession(
+                connector=connector, cookie_jar=aiohttp.DummyCookieJar())
+            self._asem = asyncio.Semaphore(self.ASYNC_CONCURRENCY)
+            self._ahosts = {}
+        return self._as
+
+    @asynccontextmanager
+    async def _asyncSlot(self, url: str):
+        '''
+        hold one per-bee and one per-host slot for the duration of a request.
+        '''
+        import asyncio
+        # the semaphores are set up along with the session, per loop
+        self._asyncSession()
+        host = urlsplit(url).netloc
+        if host not in self._ahosts:
+            self._ahosts[host] = asyncio.Semaphore(self.ASYNC_PER_HOST)
+        async with self._asem, self._ahosts[host]:
+            yield
+
+    def _asyncCookies(self, prepared) -> dict:
+        '''
+        :return: <dict> the Cookie header self.s would send along with
+                        `prepared`, by domain and path, self.cookies on top
+        '''
+        jar = merge_cookies(merge_cookies(RequestsCookieJar(), self.s.cookies),
+                            self.cookies)
+        cookie = get_cookie_header(jar, prepared)
+        return {'Cookie': cookie} if cookie else {}
+
+    def _keepCookies(self, prepared, r):
+        '''
+        store what an aiohttp response sets into self.s's jar.
+        '''
+        headers = http.client.HTTPMessage()
+        for value in r.headers.getall('Set-Cookie', ()):
+            headers['Set-Cookie'] = value
+        self.s.cookies.extract_cookies(MockResponse(headers),
+                                       MockRequest(prepared))
+
+    @asynccontextmanager
+    async def _asyncOpen(self, method: str, url: str, headers=None,
+                         params=None, **kwargs):
+        '''
+        an aiohttp request whose cookies come from and go to self.s's jar,
+        redirects followed here so each hop gets its own, as with self.s.
+        '''
+        session = self._asyncSession()
+        url = requests.Request(method, url, params=params).prepare().url
+        for _ in range(self.s.max_redirects + 1):
+            prepared = requests.Request(method, url).prepare()
+            sent = dict(headers or {}, **self._asyncCookies(prepared))
+            async with session.request(method, url, headers=sent,
+                                       allow_redirects=False, **kwargs) as r:
+                self._keepCookies(prepared, r)
+                location = r.headers.get('Location')
+                if not (r.status in (301, 302, 303, 307, 308) and location):
+                    yield r
+                    return
+            url = urljoin(url, location)
+            # same as requests' rebuild_method
+            if (r.status in (302, 303) and method != 'HEAD') \
+                    or (r.status == 301 and method == 'POST'):
+                method = 'GET'
+                kwargs.pop('data', None)
+                kwargs.pop('json', None)
+        raise requests.TooManyRedirects(
+            f'exceeded {self.s.max_redirects} redirects')
+
+    async def _asyncRequest(self, method: str, url: str, **kwargs):
+        '''
+        :return: <requests.Response> so that GeneralResp treats it as usual
+        '''
+        async with self._asyncSlot(url):
+            async with self._asyncOpen(method, url, **kwargs) as r:
+                content = await r.read()
+        return buildResponse(r.status, r.headers, content,
+                             url=str(r.url), reason=r.reason)
+
+    @slowDown
+    async def _AGET(self,
+                    url: str,
+                    headers={},
+                    _params: dict = None,
+                    **kwargs) -> dict:
+        '''
+        :param _params: <dict>
+        '''
+        resp = None
+        headers = headers or self.headers.copy()
+        headers = self._checkUA(headers)
+        _params = _params or {}
+
+        try:
+            occur = time.time()
+            resp = await self._asyncRequest('GET', url,
+                                            headers=headers, params=_params)
+        except Exception as e:
+            print(f'some {e} happens during _AGET')
+        finally:
+            sigmaActions(occur)
+
+        if 'file' in kwargs:
+            return resp.content
         else:
-            with open(file_name, 'wb') as f:
-                f.write(resp)
-            print(f'{file_name} downloaded from {url}')
-
-            # stats
-            usage = time.time() - started
-            size = os.path.getsize(file_name)
-            print(f'{size} bytes, {usage:.1f} seconds. \n\
-{size / usage / 1024:.1f} kb/s')
+            return GeneralResp(resp)
+
+    @slowDown
+    async def _APOST(self, url: str, headers=None, _data=None, _params=None):
+        '''
+        :param _data: <dict> the data that aiohttp needs as json.
+        '''
+
+        headers = headers or self.headers.copy()
+        headers = self._checkUA(headers)
+        content_type = {'Content-Type': 'application/json;charset=UTF-8'}
+        headers.update(content_type)
+
+        _data = _data or {}
+        _params = _params or {}
+
+        try:
+            occur = time.time()
+            resp = await self._asyncRequest('POST', url, headers=headers,
+                                            json=_data, params=_params)
+            return GeneralResp(resp)
+        except Exception:
+            raise BumbleBeeError()
+        finally:
+            sigmaActions(occur)
+
+    async def _ASOUP(self, url: str, mode: str = 'soup', only=None):
+        resp = await self._AGET(url)
+        if resp:
+            return cookSoup(resp._content, resp.headers,
+                            mode=mode, only=only, cache=self.soup_cache)
+
+    async def _ADOWNLOAD(self,
+                         url: str,
+                         file_name=None,
+                         chunk_size: int = None,
+                         resume: bool = False):
+        '''
+        :return: bytes if no file_name, else <DownloadStats>
+
+        :param file_name: return binary content if None
+        :param resume: <bool> same as _DOWNLOAD's
+        '''
+        if not file_name:
+            return await self._AGET(url, file=True)
+
+        chunk_size = chunk_size or self.CHUNK_SIZE
+        headers = self._checkUA(self.headers.copy())
+        headers['Accept-Encoding'] = 'identity'
+
+        known = self._resumeHeaders(url, file_name, headers, resume)
+        stats = DownloadStats(url, file_name,
+                              resumed_from=known['offset'] if known else 0)
+        mode = await self._asyncStream(url, headers, file_name, chunk_size,
+                                       stats, known, resume)
+        dropPartial(file_name)
+        if mode == 'again':
+            return await self._ADOWNLOAD(url, file_name, chunk_size, resume)
+        return stats.done(os.path.getsize(file_name))
+
+    @slowDown
+    async def _asyncStream(self, url, headers, file_name, chunk_size, stats,
+                           known=None, resume=False) -> str:
+        '''
+        :return: <str> how it went, see utils.download.resumeMode
+        '''
+        occur = time.time()
+        try:
+            async with self._asyncSlot(url):
+                async with self._asyncOpen('GET', url, headers=headers) as r:
+                    mode = resumeMode(r.status, r.headers, known) \
+                        if known else 'wb'
+                    if mode in ('done', 'again'):
+                        return mode
+                    r.raise_for_status()
+                    self._beginWrite(url, file_name, r.headers, mode,
+                                     resume, stats)
+                    with open(file_name, mode) as f:
+                        async for chunk in r.content.iter_chunked(chunk_size):
+                            f.write(chunk)
+                            stats.received += len(chunk)
+                    return mode
+        finally:
+            sigmaActions(occur)
+
+    async def gather(self, urls, method: str = 'GET', **kwargs) -> list:
+        '''
+        Fetch many urls concurrently.
+
+        :return: <list> results in the same order as `urls`,
+                        a failed one comes back as its exception
+
+        :param method: <str> `GET`, `POST`, `SOUP` or `DOWNLOAD`
+        :param kwargs: passed to every single call
+        '''
+        import asyncio
+        fetch = getattr(self, f'_A{method.upper()}')
+        return await asyncio.gather(*[fetch(url, **kwargs) for url in urls],
+                                    return_exceptions=True)
+
+    async def aclose(self):
+        if getattr(self, '_as', None) is not None:
+            await self._as.close()
+            self._as = None
+            self._aloop = None
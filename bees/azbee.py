@@ -0,0 +1,170 @@
+import time
+import asyncio
+import inspect
+
+import zmq
+import zmq.asyncio
+
+from .zbee import ZBee, PENDING
+from .utils.envelope import asyncSendFrames, Stream
+
+
+async def _settle(result):
+    if inspect.isawaitable(result):
+        return await result
+    return result
+
+
+class AsyncZBee(ZBee):
+    '''
+    ZBee on zmq.asyncio: unpackage/parse/package/deliver may be coroutines,
+    and up to CONCURRENCY messages are handled at once, so one slow parse
+    no longer holds up the pipe. commands are answered by a task of
+    their own, in between.
+
+    run() blocks in a loop of its own; within an application's loop,
+    build it with start=False and await arun():
+
+        bee = AsyncZBee(start=False)
+        await bee.arun()
+    '''
+
+    CONCURRENCY = 32
+
+    # ms what's still unsent gets once stopped, then it's dropped
+    LINGER = 1000
+
+    def __init__(self, source=None, sink=None, overflow=None, control=None,
+                 hive=None, start=True, concurrency=None):
+        self.concurrency = concurrency or self.CONCURRENCY
+        super().__init__(source, sink, overflow, control, hive, start)
+
+    def _context(self):
+        return zmq.asyncio.Context()
+
+    def close(self):
+        '''
+        the context is ours alone, see _context, so it goes too.
+        '''
+        if not self.context.closed:
+            self.context.destroy(linger=self.LINGER)
+
+    def run(self):
+        asyncio.run(self.arun())
+
+    async def arun(self):
+        self.inflight = 0
+        # set whenever the backlog has room again
+        self.room = asyncio.Event()
+        # multipart sends of concurrent handlers must not interleave
+        self.sending = asyncio.Lock()
+        self.tasks = set()
+        # set by a shutdown, even halfway through a drain
+        self.halted = asyncio.Event()
+        self.reader = asyncio.ensure_future(self.aread())
+        control = None
+        if self.control:
+            control = asyncio.ensure_future(self.acontrol())
+        try:
+            await self.reader
+        except asyncio.CancelledError:
+            pass
+
+        # finishing handlers pump the rest of the backlog
+        halted = asyncio.ensure_future(self.halted.wait())
+        while self.tasks and self.state == 'draining':
+            await asyncio.wait(list(self.tasks) + [halted],
+                               return_when=asyncio.FIRST_COMPLETED)
+        halted.cancel()
+        self.state = 'stopped'
+        for task in list(self.tasks):
+            task.cancel()
+        if control is not None:
+            control.cancel()
+        print(f'zbee stopped, {self.meter}')
+        self.close()
+
+    async def aread(self):
+        while True:
+            while self.backlog.full and self.backlog.policy == 'block':
+                self.room.clear()
+                await self.room.wait()
+            frames = await self.pipe_receiver.recv_multipart(copy=False)
+            self.meter.received += 1
+            self.backlog.put(frames)
+            self.pump()
+
+    async def acontrol(self):
+        '''
+        answer commands until stopped, draining included.
+        '''
+        while True:
+            name = await self.control.recv()
+            await self.control.send(self.command(name))
+            if self.state == 'stopped':
+                self.halted.set()
+
+    def stopIntake(self):
+        self.reader.cancel()
+
+    def pump(self):
+        '''
+        start handlers for backlogged messages while slots are free.
+        '''
+        while self.state != 'stopped' and self.inflight < self.concurrency:
+            frames = self.backlog.get()
+            if frames is None:
+                break
+            self.inflight += 1
+            task = asyncio.ensure_future(self.areceive(frames))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        if not self.backlog.full:
+            self.room.set()
+
+    async def areceive(self, frames):
+        started = time.perf_counter()
+        try:
+            ok = await self.ahandle(frames)
+        except Exception as e:
+            print(f'handle failed: {e}')
+            ok = False
+        finally:
+            self.inflight -= 1
+            self.pump()
+        self.meter.observe(time.perf_counter() - started, ok)
+
+    async def ahandle(self, data) -> bool:
+        received = None
+        try:
+            for stage in self.STAGES:
+                started = time.perf_counter()
+                data = await _settle(getattr(self, stage)(data))
+                self.meter.time(stage, time.perf_counter() - started)
+                if data is PENDING:
+                    return True
+                if received is None:
+                    received = data
+            return data
+        finally:
+            self.spool.release(received)
+
+    async def deliver(self, dealt_data) -> bool:
+        flag = False
+        try:
+            if isinstance(dealt_data, Stream):
+                # chunk by chunk, other replies may go in between
+                for frames in dealt_data:
+                    async with self.sending:
+                        await asyncSendFrames(self.semi, frames)
+            else:
+                async with self.sending:
+                    if isinstance(dealt_data, (bytes, zmq.Frame)):
+                        await self.semi.send(dealt_data)
+                    else:
+                        await asyncSendFrames(self.semi, dealt_data)
+            flag = True
+        except Exception as e:
+            print(e)
+            flag = False
+        return flag
@@ -0,0 +1,64 @@
+__doc__ = '''import time of bees modules, each in a fresh interpreter.
+
+    python -m bees.benchimport
+    python -m bees.benchimport bees.zbee bees.utils.hub -n 10 --top 5
+'''
+import sys
+import argparse
+import statistics
+import subprocess
+
+MODULES = ('bees',
+           'bees.utils',
+           'bees.abstractbee',
+           'bees.zbee',
+           'bees.azbee',
+           'bees.utils.hub')
+
+
+def importTime(module: str):
+    '''
+    :return: (<float> seconds, <list> of (seconds, name) for each import
+             made directly by `module`), from python -X importtime
+    '''
+    done = subprocess.run([sys.executable, '-X', 'importtime',
+                           '-c', f'import {module}'],
+                          capture_output=True, text=True, check=True)
+    children = []
+    for line in done.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        # a space, then two more per level of nesting
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        seconds = int(cumulative) / 1e6
+        if depth == 1:
+            children.append((seconds, name.strip()))
+        elif depth == 0:
+            if name.strip() == module:
+                return seconds, children
+            children = []
+    raise RuntimeError(f'no import time found for {module}')
+
+
+def bench(modules=MODULES, runs=5, top=3):
+    for module in modules:
+        timings = []
+        for _ in range(runs):
+            total, children = importTime(module)
+            timings.append(total)
+        print(f'{module:<24} {statistics.median(timings) * 1000:8.1f} ms '
+              f'(best {min(timings) * 1000:.1f} of {runs})')
+        for seconds, name in sorted(children, reverse=True)[:top]:
+            print(f'    {name:<20} {seconds * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    parser.add_argument('-n', '--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=3,
+                        help='heaviest direct imports shown per module')
+    args = parser.parse_args()
+    bench(args.modules, args.runs, args.top)
@@ -4,7 +4,8 @@ class BumbleBeeError(Exception):
         1001: '_GET: resp not ok.',
         1002: '_GET: cannot decode JSON.',
         1003: '_POST: resp not ok.',
-        1004: '_POST: cannot decode JSON.'
+        1004: '_POST: cannot decode JSON.',
+        1005: '_DOWNLOAD: byte range not served.',
     }
 
     def __init__(self, err_code=None):
@@ -1,9 +1,38 @@
-from .hub import ImageHub
-from .ip import getSelfIP
-from .sumchars import sumChars
-from .safecheck import slowDown
-from .respadapter import GeneralResp
-from .sac import SelfAssemblingClass
-from .sigmaactions import sigmaActions
-from .tiempo import fancyTiempo, fancyTQ
-from .misc import is_url, asciiBigSuccess
+# names are imported on first use, so `import bees.utils` stays cheap
+# and numpy, PIL & co. only load for whoever touches ImageHub
+_LAZY = {
+    'ImageHub': '.hub',
+    'ImagePipeline': '.pipeline',
+    'getSelfIP': '.ip',
+    'sumChars': '.sumchars',
+    'slowDown': '.safecheck',
+    'safeCheck': '.safecheck',
+    'HostLimiter': '.safecheck',
+    'WindowLimiter': '.safecheck',
+    'GeneralResp': '.respadapter',
+    'buildResponse': '.respadapter',
+    'ResponseCache': '.httpcache',
+    'SelfAssemblingClass': '.sac',
+    'SelfAssemblingList': '.sac',
+    'sigmaActions': '.sigmaactions',
+    'ActionRecorder': '.sigmaactions',
+    'fancyTiempo': '.tiempo',
+    'fancyTQ': '.tiempo',
+    'is_url': '.misc',
+    'asciiBigSuccess': '.misc',
+}
+
+__all__ = list(_LAZY)
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    from importlib import import_module
+    value = getattr(import_module(_LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
@@ -0,0 +1,100 @@
+__doc__ = 'bounded buffer of multipart messages, and what to do once full'
+import os
+import pickle
+import itertools
+from collections import deque
+
+POLICIES = ('block', 'drop', 'spill')
+
+
+class Backlog():
+    '''
+    FIFO of messages, each a list of frames, kept to `maxsize` in memory.
+
+    once full, `policy` decides:
+        block   put refuses, the caller stops reading so the socket's HWM
+                pushes back upstream, nothing is lost
+        drop    the oldest message makes room, counted in `dropped`
+        spill   newer messages go to files under `spool`, and come back
+                in order as room frees up, counted in `spilled`
+
+    :param maxsize: <int> messages kept in memory
+    :param policy: <str> one of POLICIES
+    :param spool: <str> directory for spilled messages
+    '''
+
+    def __init__(self, maxsize=1000, policy='block', spool='var/zbee/spill'):
+        if policy not in POLICIES:
+            raise ValueError(f'unknown overflow policy {policy}')
+        self.maxsize = maxsize
+        self.policy = policy
+        self.spool = spool
+        self.queue = deque()
+        self.files = deque()
+        self.names = itertools.count()
+        self.dropped = 0
+        self.spilled = 0
+        self.peak = 0
+
+    def __len__(self):
+        return len(self.queue) + len(self.files)
+
+    @property
+    def full(self) -> bool:
+        return len(self.queue) >= self.maxsize
+
+    def put(self, frames) -> bool:
+        '''
+        :return: <bool> False if refused, only ever with `block`
+        '''
+        # once spilling, newer ones queue up on disk behind the older
+        if self.full or self.files:
+            if self.policy == 'block':
+                return False
+            elif self.policy == 'spill':
+                self._spill(frames)
+                return True
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append(frames)
+        self.peak = max(self.peak, len(self))
+        return True
+
+    def get(self):
+        '''
+        :return: the oldest message, None if empty
+        '''
+        if not self.queue:
+            if not self.files:
+                return None
+            self.queue.append(self._unspill())
+        frames = self.queue.popleft()
+        if self.files and not self.full:
+            self.queue.append(self._unspill())
+        return frames
+
+    def _spill(self, frames):
+        os.makedirs(self.spool, exist_ok=True)
+        path = os.path.join(self.spool,
+                            f'{os.getpid()}-{next(self.names)}.spill')
+        with open(path, 'wb') as f:
+            pickle.dump([bytes(frame) for frame in frames], f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        self.files.append(path)
+        self.spilled += 1
+        self.peak = max(self.peak, len(self))
+
+    def _unspill(self) -> list:
+        path = self.files.popleft()
+        with open(path, 'rb') as f:
+            frames = pickle.load(f)
+        os.remove(path)
+        return frames
+
+    def snapshot(self) -> dict:
+        return {'depth': len(self),
+                'on_disk': len(self.files),
+                'peak': self.peak,
+                'dropped': self.dropped,
+                'spilled': self.spilled,
+                'policy': self.policy}
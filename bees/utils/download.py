@@ -0,0 +1,139 @@
+import os
+import re
+import json
+import time
+
+CONTENT_RANGE = re.compile(r'bytes (\d+)-(\d+)/(\d+|\*)')
+
+
+class DownloadStats():
+    '''
+    what _DOWNLOAD tells about a file it saved.
+
+    :attr size: <int> bytes on disk when done
+    :attr received: <int> bytes actually transferred this time
+    :attr resumed_from: <int> bytes already on disk before starting
+    '''
+
+    __slots__ = ('url', 'file_name', 'size', 'received', 'resumed_from',
+                 'segments', 'started', 'finished')
+
+    def __init__(self, url, file_name, resumed_from=0, segments=1):
+        self.url = url
+        self.file_name = file_name
+        self.size = 0
+        self.received = 0
+        self.resumed_from = resumed_from
+        self.segments = segments
+        self.started = time.time()
+        self.finished = None
+
+    def done(self, size):
+        self.size = size
+        self.finished = time.time()
+        return self
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def speed(self) -> float:
+        '''
+        bytes per second over the transfer
+        '''
+        return self.received / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return f'{self.file_name}: {self.size} bytes, \
+{self.received} received in {self.elapsed:.1f} seconds, \
+{self.speed / 1024:.1f} kb/s'
+
+
+def splitRange(length: int, parts: int) -> list:
+    '''
+    :return: <list> inclusive (start, end) byte ranges covering `length`
+    '''
+    if length <= 0:
+        return []
+    parts = max(1, min(parts, length))
+    step = -(-length // parts)
+    return [(start, min(start + step, length) - 1)
+            for start in range(0, length, step)]
+
+
+def partialPath(file_name: str) -> str:
+    return f'{file_name}.part'
+
+
+def loadPartial(file_name: str, url: str) -> dict:
+    '''
+    :return: <dict> url, validator, total & offset of an unfinished
+                    download of `url` into file_name, None if there's
+                    nothing safe to go on from
+    '''
+    try:
+        with open(partialPath(file_name)) as f:
+            known = json.load(f)
+        known['offset'] = os.path.getsize(file_name)
+    except (OSError, ValueError):
+        return None
+    if known.get('url') != url or not known.get('validator') \
+            or not known['offset']:
+        return None
+    return known
+
+
+def validatorOf(headers) -> str:
+    '''
+    what tells this content apart: a strong ETag, or else Last-Modified
+    '''
+    etag = headers.get('ETag', '')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return headers.get('Last-Modified')
+
+
+def savePartial(file_name: str, url: str, headers):
+    '''
+    remember the validator for `If-Range`; without one it can't be resumed.
+    '''
+    validator = validatorOf(headers)
+    if not validator:
+        dropPartial(file_name)
+        return
+    length = headers.get('Content-Length')
+    with open(partialPath(file_name), 'w') as f:
+        json.dump({'url': url,
+                   'validator': validator,
+                   'total': int(length) if length else None}, f)
+
+
+def dropPartial(file_name: str):
+    try:
+        os.remove(partialPath(file_name))
+    except FileNotFoundError:
+        pass
+
+
+def resumeMode(status: int, headers, known: dict) -> str:
+    '''
+    what to do with the answer to a `Range` + `If-Range` request:
+        ab      append, the range starts at our offset of the same content
+        wb      write it all over, the content changed and came whole
+        done    nothing left to fetch, the file is complete
+        again   of no use, ask for the whole file
+    '''
+    offset, total = known['offset'], known.get('total')
+    if status == 416:
+        return 'done' if total == offset else 'again'
+    if status == 206:
+        match = CONTENT_RANGE.match(headers.get('Content-Range', ''))
+        # some servers ignore If-Range, so check the validator again
+        served = validatorOf(headers)
+        if match and int(match.group(1)) == offset \
+                and (total is None or match.group(3) == str(total)) \
+                and served in (None, known['validator']):
+            return 'ab'
+        return 'again'
+    return 'wb'
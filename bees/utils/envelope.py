@@ -0,0 +1,110 @@
+__doc__ = '''ZBee wire format.
+
+a multipart message: one json header frame, then raw binary body frames.
+
+    [b'{"zb": 1, "kind": "bytes", "frames": 1}', <body>]
+
+files go as a Stream, one message per chunk, as zmq only hands a
+multipart message over once all of it is queued:
+
+    [b'{"zb": 1, "kind": "chunk", "stream": "9f..", "seq": 0,
+        "count": 3, "name": "a.mp4", ...}', <chunk>]
+
+anything else, e.g. a bare single frame, is left to the legacy text path.
+'''
+import os
+import uuid
+
+import zmq
+
+from .fastjson import loads, dumps, JSONDecodeError
+
+VERSION = 1
+CHUNK_SIZE = 1024 * 1024
+
+
+def seal(header: dict, *bodies) -> list:
+    header = dict(header, zb=VERSION, frames=len(bodies))
+    return [dumps(header), *bodies]
+
+
+class Stream():
+    '''
+    a file as sealed `chunk` messages, read from disk one at a time.
+
+    :param header: <dict> sent along with every chunk, e.g. {'of': 'video'}
+    '''
+
+    __slots__ = ('path', 'header', 'chunk_size')
+
+    def __init__(self, path: str, header=None, chunk_size=CHUNK_SIZE):
+        self.path = path
+        self.header = header or {}
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        size = os.path.getsize(self.path)
+        # an empty file is still one, empty, chunk
+        count = max(1, -(-size // self.chunk_size))
+        header = dict(self.header,
+                      kind='chunk',
+                      stream=uuid.uuid4().hex,
+                      count=count,
+                      size=size,
+                      chunk_size=self.chunk_size,
+                      name=os.path.basename(self.path))
+        chunks = fileChunks(self.path, self.chunk_size)
+        for seq in range(count):
+            yield seal(dict(header, seq=seq), next(chunks, b''))
+
+
+def unseal(frames):
+    '''
+    :param frames: <list> of zmq.Frame or bytes
+    :return: (header, bodies as buffers), header is None if not sealed
+    '''
+    buffers = [f.buffer if isinstance(f, zmq.Frame) else f for f in frames]
+    try:
+        # header frames are small, copying one is nothing
+        header = loads(bytes(buffers[0]))
+    except (JSONDecodeError, ValueError, TypeError):
+        return None, buffers
+    if not isinstance(header, dict) or header.get('zb') != VERSION:
+        return None, buffers
+    return header, buffers[1:]
+
+
+def fileChunks(path: str, chunk_size: int = CHUNK_SIZE):
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def sendFrames(socket, frames, flags=0):
+    '''
+    send an iterable of frames as one multipart message,
+    pulling the next one only once the previous is queued.
+    '''
+    previous = None
+    for frame in frames:
+        if previous is not None:
+            socket.send(previous, flags | zmq.SNDMORE, copy=False)
+        previous = frame
+    if previous is not None:
+        socket.send(previous, flags, copy=False)
+
+
+async def asyncSendFrames(socket, frames, flags=0):
+    '''
+    sendFrames for zmq.asyncio sockets.
+    '''
+    previous = None
+    for frame in frames:
+        if previous is not None:
+            await socket.send(previous, flags | zmq.SNDMORE, copy=False)
+        previous = frame
+    if previous is not None:
+        await socket.send(previous, flags, copy=False)
@@ -0,0 +1,10 @@
+__doc__ = 'json by orjson when installed, by json otherwise'
+
+try:
+    from orjson import loads, dumps, JSONDecodeError
+except ImportError:
+    import json
+    from json import loads, JSONDecodeError
+
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode()
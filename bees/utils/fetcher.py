@@ -0,0 +1,75 @@
+__doc__ = 'remote image bytes, over one pooled session, cached & coalesced'
+import threading
+from concurrent.futures import Future
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .httpcache import ResponseCache
+
+
+class RemoteFetcher():
+    '''
+    Fetch urls over one keep-alive session with timeouts.
+
+    bodies are kept in a ResponseCache, keyed by url and revalidated by
+    their ETag/Last-Modified once stale; callers asking for a url already
+    on its way wait for that same download instead of starting another.
+
+    :param timeout: <tuple> (connect, read) seconds
+    :param pool: <int> connections kept per host
+    :param default_ttl: <float> seconds a body without cache headers
+                                is reused without asking the server
+    :param directory: <str> on-disk cache tier, off if None
+    '''
+
+    def __init__(self,
+                 timeout=(5, 30),
+                 pool=16,
+                 maxbytes=128 * 1024 * 1024,
+                 default_ttl=300,
+                 directory=None):
+        self.timeout = timeout
+        self.s = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool, pool_maxsize=pool)
+        self.s.mount('http://', adapter)
+        self.s.mount('https://', adapter)
+        self.cache = ResponseCache(maxbytes=maxbytes,
+                                   directory=directory,
+                                   default_ttl=default_ttl)
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.coalesced = 0
+
+    def _send(self, url, headers, params):
+        return self.s.get(url, headers=headers, params=params,
+                          timeout=self.timeout)
+
+    def get(self, url: str) -> bytes:
+        '''
+        :return: <bytes> body of a 200 response, raises otherwise
+        '''
+        with self.lock:
+            future = self.inflight.get(url)
+            leader = future is None
+            if leader:
+                future = self.inflight[url] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            resp = self.cache.fetch(url, {}, {}, self._send)
+            resp.raise_for_status()
+            future.set_result(resp.content)
+            return resp.content
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[url]
+
+
+FETCHER = RemoteFetcher()
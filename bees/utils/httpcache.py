@@ -0,0 +1,258 @@
+__doc__ = 'opt-in HTTP cache for AbstractBee._GET'
+import os
+import time
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+
+from requests.structures import CaseInsensitiveDict
+
+from .respadapter import buildResponse
+
+
+def parseCacheControl(value: str) -> dict:
+    '''
+    'max-age=60, no-cache' -> {'max-age': '60', 'no-cache': None}
+    '''
+    directives = {}
+    for part in value.split(','):
+        name, _, arg = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = arg.strip('"') or None
+    return directives
+
+
+def parseDate(value):
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def freshFor(headers, default=0) -> float:
+    '''
+    :return: <float> seconds the response stays fresh,
+                     None if it must not be stored at all
+
+    :param default: <float> lifetime when the server tells nothing
+    '''
+    cc = parseCacheControl(headers.get('Cache-Control', ''))
+    if 'no-store' in cc:
+        return None
+    if 'no-cache' in cc:
+        return 0
+
+    if 'max-age' in cc:
+        try:
+            lifetime = float(cc['max-age'])
+        except (TypeError, ValueError):
+            lifetime = 0
+    else:
+        if 'Expires' not in headers:
+            return default
+        expires = parseDate(headers.get('Expires'))
+        if expires is None:
+            return 0
+        date = parseDate(headers.get('Date')) or time.time()
+        lifetime = expires - date
+
+    try:
+        age = float(headers.get('Age', 0))
+    except ValueError:
+        age = 0
+    return max(0, lifetime - age)
+
+
+class CacheEntry():
+
+    __slots__ = ('status', 'headers', 'content', 'url', 'expires', 'vary')
+
+    # a 304 says nothing about the body we hold
+    BODY_HEADERS = ('content-length', 'content-encoding', 'transfer-encoding')
+
+    def __init__(self, resp, request_headers, default_ttl=0):
+        self.status = resp.status_code
+        self.headers = CaseInsensitiveDict(resp.headers)
+        self.content = resp.content
+        self.url = resp.url
+        lifetime = freshFor(resp.headers, default_ttl)
+        self.expires = time.time() + (lifetime or 0)
+        self.vary = {name: request_headers.get(name)
+                     for name in self.varyNames(resp.headers)}
+
+    @staticmethod
+    def varyNames(headers) -> list:
+        vary = headers.get('Vary', '')
+        return [h.strip().lower() for h in vary.split(',') if h.strip()]
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires
+
+    def matches(self, request_headers) -> bool:
+        return all(request_headers.get(name) == value
+                   for name, value in self.vary.items())
+
+    def validators(self) -> dict:
+        validators = {}
+        if 'ETag' in self.headers:
+            validators['If-None-Match'] = self.headers['ETag']
+        if 'Last-Modified' in self.headers:
+            validators['If-Modified-Since'] = self.headers['Last-Modified']
+        return validators
+
+    def refresh(self, not_modified, default_ttl=0):
+        '''
+        take the new validity of a 304 response.
+        '''
+        for name, value in not_modified.headers.items():
+            if name.lower() not in self.BODY_HEADERS:
+                self.headers[name] = value
+        lifetime = freshFor(self.headers, default_ttl)
+        self.expires = time.time() + (lifetime or 0)
+
+    def response(self):
+        return buildResponse(self.status, self.headers, self.content,
+                             url=self.url, reason='OK')
+
+
+class ResponseCache():
+    '''
+    LRU in memory, optionally backed by a directory of pickles.
+
+    :param maxsize: <int> entries kept in memory
+    :param maxbytes: <int> body bytes kept in memory
+    :param directory: <str> on-disk tier, off if None
+    :param default_ttl: <float> seconds a response without Cache-Control
+                                or Expires counts as fresh, 0 by the RFC
+    '''
+
+    def __init__(self, maxsize=256, maxbytes=64 * 1024 * 1024,
+                 directory=None, default_ttl=0):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.directory = directory
+        self.default_ttl = default_ttl
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.not_modified = 0
+
+    @property
+    def stats(self) -> dict:
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'revalidations': self.revalidations,
+                'not_modified': self.not_modified,
+                'entries': len(self.entries),
+                'bytes': self.nbytes}
+
+    @staticmethod
+    def key(method: str, url: str, params=None) -> str:
+        params = sorted((params or {}).items())
+        raw = f'{method.upper()} {url} {params}'
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.pickle')
+
+    def get(self, key: str):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry
+
+        if self.directory:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    entry = pickle.load(f)
+            except (OSError, pickle.PickleError, EOFError):
+                return None
+            self.put(key, entry, disk=False)
+        return entry
+
+    def put(self, key: str, entry: CacheEntry, disk=True):
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= len(old.content)
+            self.entries[key] = entry
+            self.nbytes += len(entry.content)
+            while self.entries and (len(self.entries) > self.maxsize or
+                                    self.nbytes > self.maxbytes):
+                _, evicted = self.entries.popitem(last=False)
+                self.nbytes -= len(evicted.content)
+
+        if disk and self.directory:
+            temp = f'{self._path(key)}.{threading.get_ident()}'
+            with open(temp, 'wb') as f:
+                pickle.dump(entry, f)
+            os.replace(temp, self._path(key))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+        if self.directory:
+            for name in os.listdir(self.directory):
+                if name.endswith('.pickle'):
+                    os.remove(os.path.join(self.directory, name))
+
+    def fetch(self, url: str, params: dict, headers: dict, send,
+              method='GET'):
+        '''
+        serve from cache, revalidate or send for real.
+
+        :param send: <callable> send(url, headers, params) -> requests.Response
+        :return: <requests.Response> or None if send failed
+        '''
+        key = self.key(method, url, params)
+        request_headers = CaseInsensitiveDict(headers)
+        entry = self.get(key)
+        if entry is not None and not entry.matches(request_headers):
+            entry = None
+
+        if entry is not None and entry.fresh:
+            self.hits += 1
+            return entry.response()
+
+        validators = entry.validators() if entry is not None else {}
+        if validators:
+            self.revalidations += 1
+            headers = {**headers, **validators}
+        else:
+            self.misses += 1
+
+        resp = send(url, headers, params)
+        if resp is None:
+            return None
+
+        if resp.status_code == 304 and entry is not None:
+            self.not_modified += 1
+            entry.refresh(resp, self.default_ttl)
+            self.put(key, entry)
+            return entry.response()
+
+        if self.storable(resp):
+            self.put(key, CacheEntry(resp, request_headers, self.default_ttl))
+        return resp
+
+    def storable(self, resp) -> bool:
+        if resp.status_code != 200:
+            return False
+        if resp.headers.get('Vary', '').strip() == '*':
+            return False
+        lifetime = freshFor(resp.headers, self.default_ttl)
+        if lifetime is None:
+            return False
+        return lifetime > 0 or 'ETag' in resp.headers \
+            or 'Last-Modified' in resp.headers
@@ -3,23 +3,42 @@ __version__ = '2c37c'
 
 import os
 import uuid
+import weakref
 import base64
-import requests
 import numpy as np
 from PIL import Image
 from io import BytesIO
 
+from . import imageops
+
 
 class ImageHubError(Exception):
     pass
 
 
+def _removeFile(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
 class ImageHub():
     '''
     Awesome image operational tool for humans.
+
+    vectorized pixel operations live in `ImageHub.ops`,
+    e.g. ImageHub.ops.threshold(hub._ndarray, 100)
     '''
 
+    ops = imageops
+    # remote inputs come through here: pooled, cached, coalesced;
+    # None for the shared FETCHER, imported with the first url
+    fetcher = None
+
     DEFAULT_SIZE = (1024, 1289)
+    # rows decoded at a time by memmap()
+    STRIP = 256
     VALID_FILETYPES = (
         '.jpg'
         '.jpeg'
@@ -30,79 +49,164 @@ class ImageHub():
     )
 
     def __init__(self, _input, size=None):
+        '''
+        :param size: <tuple> (width, height) to fit in; JPEGs are then
+                     decoded at a reduced scale, never at full resolution
+        '''
 
-        self.image = self.convert(_input, to='PIL.Image')
-        self._ndarray = self.convert(_input, to='np.ndarray')
-        self._bytes = self.convert(_input, to='bytes')
-        self._base64 = self.convert(_input, to='base64')
+        # decoded once, every other form derives from it on first access
+        self.image, self.file_type = self._open(_input)
+        self._forms = {}
 
-        self.width = len(self._ndarray[0])
-        self.height = len(self._ndarray)
+        if size:
+            if isinstance(_input, (ImageHub, Image.Image)):
+                # not ours to shrink in place
+                self.image = self.image.copy()
+            # on a not yet loaded image this drafts the decoder down first
+            self.image.thumbnail(size, reducing_gap=2.0)
+
+        self.width, self.height = self.image.size
         self.size = (self.height, self.width)
 
+    @property
+    def _ndarray(self):
+        return self._form('np.ndarray')
+
+    @property
+    def _bytes(self):
+        return self._form('bytes')
+
+    @property
+    def _base64(self):
+        return self._form('base64')
+
+    @property
+    def _data_uri(self):
+        return self._form('data_uri')
+
+    @property
+    def _mime(self):
+        '''
+        MIMEImage of the encoded image, in its own format or png,
+        encoded in memory off the already decoded image.
+        a new one every time, as callers add their own headers.
+        '''
+        from email.mime.image import MIMEImage
+        format = self.file_type or 'png'
+        buffer = self.encode(self.image, format)
+        subtype = Image.MIME.get(self._pilFormat(format), 'image/png')
+        return MIMEImage(buffer.getvalue(), _subtype=subtype.split('/')[1])
+
+    def _form(self, to):
+        if to not in self._forms:
+            self._forms[to] = self._render(self.image, to, self.file_type)
+        return self._forms[to]
+
+    def drop(self, *forms):
+        '''
+        forget cached forms, all of them if none given.
+        they are computed again on next access.
+
+        :param forms: <str> `np.ndarray`, `bytes` or `base64`
+        '''
+        for to in forms or list(self._forms):
+            self._forms.pop(to, None)
+            if to == 'np.ndarray' and getattr(self, '_tempfile', None):
+                # the memmap's temp file goes with it
+                self._tempfile()
+                self._tempfile = None
+
     @classmethod
-    def convert(self, _input, to='PIL.Image'):
+    def convert(self, _input, to='PIL.Image', format='original',
+                quality=None):
+        '''
+        :param to: <str> `PIL.Image`, `np.ndarray`, `bytes` (raw pixels),
+                         `base64` or `data_uri` (of the encoded file)
+        :param format: <str> for base64 & data_uri: `original`, or jpeg,
+                             png, webp...
+        :param quality: <int> for jpeg & webp
+        '''
         try:
-            output = 'not ready yet'
-            file_type = None
-            is_file_name = False
-
-            if isinstance(_input, ImageHub):
-                hub = _input.image
-            elif isinstance(_input, Image.Image):
-                hub = _input
-            elif isinstance(_input, np.ndarray):
-                hub = Image.fromarray(_input)
-            elif isinstance(_input, tuple):
-                hub = Image.fromarray(_input)
-            elif isinstance(_input, bytes):
-                hub = Image.open(BytesIO(_input))
-            elif isinstance(_input, str) and os.path.isfile(_input):
-                hub = Image.open(_input)
-                is_file_name = True
-            elif self.is_valid_url(self, _input):
-                is_file_name = True
-                try:
-                    _bytes = requests.get(_input).content
-                    hub = Image.open(BytesIO(_bytes))
-                except Exception:
-                    raise ImageHubError('Image url not valid.')
-            elif isinstance(_input, str) and _input.startswith('data:image/'):
-                try:
-                    if ',' in _input:
-                        header = _input.split(',')[0]
-                        _bytes = base64.b64decode(_input.replace(header, ''))
-                    else:
-                        _bytes = base64.b64decode(_input)
-                    hub = Image.open(BytesIO(_bytes))
-                except Exception:
-                    raise ImageHubError('Invalid base64 encoding.')
-            else:
-                raise ImageHubError('Invalid input or type not supported.')
-
-            if is_file_name:
-                if _input.split('.')[-1] in self.VALID_FILETYPES:
-                    file_type = _input.split('.')[-1]
-
-            if not hub:
-                return '_input not converted'
-            elif to == 'PIL.Image':
-                output = hub
-            elif to == 'np.ndarray':
-                output = np.array(hub)
-            elif to == 'bytes':
-                output = hub.tobytes()
-            elif to == 'base64':
-                if not file_type:
-                    header = b'data:image/.+;base64,'
-                else:
-                    header = bytes(f'data:image/{file_type};base64,'.encode())
-                data = base64.b64encode(hub.tobytes())
-                output = header + data
-            return output
+            hub, file_type = self._open(_input)
+            return self._render(hub, to, file_type, format, quality)
         except Exception as e:
             print(e)
 
+    @classmethod
+    def _open(self, _input):
+        '''
+        :return: (PIL.Image, file_type or None)
+        '''
+        file_type = None
+        is_file_name = False
+
+        if isinstance(_input, ImageHub):
+            return _input.image, _input.file_type
+        elif isinstance(_input, Image.Image):
+            hub = _input
+        elif isinstance(_input, np.ndarray):
+            hub = Image.fromarray(_input)
+        elif isinstance(_input, tuple):
+            hub = Image.fromarray(_input)
+        elif isinstance(_input, bytes):
+            hub = Image.open(BytesIO(_input))
+        elif isinstance(_input, str) and os.path.isfile(_input):
+            hub = Image.open(_input)
+            is_file_name = True
+        elif self.is_valid_url(self, _input):
+            is_file_name = True
+            try:
+                if self.fetcher is None:
+                    from .fetcher import FETCHER
+                    self.fetcher = FETCHER
+                _bytes = self.fetcher.get(_input)
+                hub = Image.open(BytesIO(_bytes))
+            except Exception:
+                raise ImageHubError('Image url not valid.')
+        elif isinstance(_input, str) and _input.startswith('data:image/'):
+            try:
+                if ',' in _input:
+                    header = _input.split(',')[0]
+                    _bytes = base64.b64decode(_input.replace(header, ''))
+                else:
+                    _bytes = base64.b64decode(_input)
+                hub = Image.open(BytesIO(_bytes))
+            except Exception:
+                raise ImageHubError('Invalid base64 encoding.')
+        else:
+            raise ImageHubError('Invalid input or type not supported.')
+
+        if is_file_name:
+            if _input.split('.')[-1] in self.VALID_FILETYPES:
+                file_type = _input.split('.')[-1]
+        if not file_type and hub.format:
+            file_type = hub.format.lower()
+
+        return hub, file_type
+
+    @classmethod
+    def _render(self, hub, to, file_type=None, format='original',
+                quality=None):
+        output = 'not ready yet'
+        if not hub:
+            return '_input not converted'
+        elif to == 'PIL.Image':
+            output = hub
+        elif to == 'np.ndarray':
+            output = np.array(hub)
+        elif to == 'bytes':
+            output = hub.tobytes()
+        elif to in ('base64', 'data_uri'):
+            if format == 'original':
+                format = file_type or 'png'
+            buffer = self.encode(hub, format, quality)
+            # straight off the buffer, no getvalue() copy
+            output = base64.b64encode(buffer.getbuffer())
+            if to == 'data_uri':
+                mime = Image.MIME.get(self._pilFormat(format), 'image/png')
+                output = f'data:{mime};base64,{output.decode()}'
+        return output
+
     def look(self, _input=None):
         img = _input or self.image
         self.convert(img, to='PIL.Image').show()
@@ -110,34 +214,68 @@ class ImageHub():
     @classmethod
     def invert(self, _input):
         _input = self.convert(_input, 'np.ndarray')
-        for y in range(len(_input)):
-            for x in range(len(_input[0])):
-                _input[y][x] = abs(255-_input[y][x])
-        return _input
+        # a fresh array, so in place
+        return self.ops.invert(_input, out=_input)
+
+    @staticmethod
+    def _pilFormat(format: str) -> str:
+        format = (format or 'png').lower()
+        return 'JPEG' if format in ('jpg', 'jpeg') else format.upper()
+
+    @classmethod
+    def encode(self, _input, format='jpeg', quality=None, buffer=None,
+               **options):
+        '''
+        encode into memory, nothing touches the disk.
+
+        :return: the buffer, a BytesIO unless one is given
+
+        :param format: <str> jpeg, png, webp... anything PIL writes
+        :param quality: <int> 1-95 for jpeg/webp, ignored by the others
+        :param options: passed to PIL.Image.save, e.g. optimize=True
+        '''
+        img = self.convert(_input, to='PIL.Image')
+        format = self._pilFormat(format)
+        if format == 'JPEG' and img.mode not in ('RGB', 'L', 'CMYK'):
+            img = img.convert('RGB')
+        if quality is not None:
+            options['quality'] = quality
+
+        buffer = buffer if buffer is not None else BytesIO()
+        img.save(buffer, format=format, **options)
+        return buffer
 
     @classmethod
-    def save(self, _input=None, filename: str = None, format='jpeg') -> str:
+    def save(self, _input=None, filename=None, format=None, quality=None,
+             **options):
+        '''
+        :return: filename, or the buffer if `filename` is a file object
+
+        :param filename: <str> path, or any writable binary file object;
+                               a file under var/tmp/ if None
+        :param format: <str> by filename's extension if None, else jpeg
+        '''
         _input = self.convert(_input, to='PIL.Image') or self.image
+        if not format and isinstance(filename, str):
+            ext = os.path.splitext(filename)[1].lower()
+            format = Image.registered_extensions().get(ext)
+        format = format or 'jpeg'
 
-        def makeFilename(filename=None, format='jpeg'):
-            if filename:
-                suffix = filename.split('.')[-1]
+        if hasattr(filename, 'write'):
+            return self.encode(_input, format, quality, filename, **options)
+
+        def makeFilename(format='jpeg'):
+            if format.lower() in ['jpg', 'jpeg']:
+                suffix = '.jpeg'
             else:
-                if format in ['jpg', 'jpeg']:
-                    suffix = '.jpeg'
-                elif format is 'png':
-                    suffix = '.png'
+                suffix = f'.{format.lower()}'
             return uuid.uuid4().__str__() + suffix
 
-        try:
-            os.listdir('var/tmp/')
-        except Exception:
-            os.makedirs('var/tmp')
-
         if not filename:
+            os.makedirs('var/tmp', exist_ok=True)
             filename = 'var/tmp/' + makeFilename(format=format)
 
-        _input.save(filename)
+        self.encode(_input, format, quality, filename, **options)
         return filename
 
     def addBleed(self,
@@ -147,7 +285,7 @@ class ImageHub():
                  direction='vertical'
                  ):
         '''
-        Add customized bleed piece on the given image.
+        Add customized bleed piece on the given image, in memory.
 
         :return: ImageHub object
 
@@ -155,7 +293,7 @@ class ImageHub():
         :param size: <tuple> target size,
                              not to confused with bleeding size
                              (width, height) looks like (1280,664)
-        :param color: <str> or <int> # TODO
+        :param color: <str> or <int> or <tuple>, anything PIL takes
         :param direction: <str> `vertical` or `horizontal` # TODO
 
         '''
@@ -163,14 +301,19 @@ class ImageHub():
         img = img or self.image
         img = ImageHub(img).image
 
-        if color == 'black':
-            target = ImageHub.new(size=size).image
-            bleeding = int((size[0] - img.width)/2)
-            target.paste(img, (bleeding, 0, img.width + bleeding, img.height))
-            temp = self.save(target)
-            return ImageHub(temp)
-        else:
-            raise NotImplementedError
+        target = Image.new('RGB', size, color)
+        bleeding = int((size[0] - img.width)/2)
+        target.paste(img, (bleeding, 0, img.width + bleeding, img.height))
+        return ImageHub(target)
+
+    def pad(self, top=0, bottom=0, left=0, right=0, color='black'):
+        '''
+        grow the canvas around the image, in memory.
+        '''
+        size = (self.width + left + right, self.height + top + bottom)
+        target = Image.new(self.image.mode, size, color)
+        target.paste(self.image, (left, top))
+        return ImageHub(target)
 
     def is_valid_url(self, _input):
         flag = False
@@ -185,5 +328,62 @@ class ImageHub():
         _size = size or self.DEFAULT_SIZE
         return ImageHub(Image.new('RGB', _size))
 
-    def resize(self, size):
-        return ImageHub(self.image.resize(size))
+    def resize(self, size, reducing_gap=None):
+        '''
+        :param reducing_gap: <float> e.g. 2.0 or 3.0, shrink by cheap
+                             integer reduce() first, then resample the rest
+        '''
+        return ImageHub(self.image.resize(size, reducing_gap=reducing_gap))
+
+    def thumbnail(self, size):
+        '''
+        fast shrink to fit in size, keeping the aspect ratio.
+        '''
+        return ImageHub(self.image, size=size)
+
+    def memmap(self, filename=None):
+        '''
+        park the pixels in a .npy file, used as _ndarray from then on.
+
+        PIL still holds the whole decoded image in self.image, this only
+        spares a second full size copy as ndarray, which the OS can page
+        out, and other processes can open the file read-only.
+
+        :param filename: <str> kept, yours to delete; if None, a temp file
+                               under var/tmp is made, removed on drop()
+                               or once this hub is garbage collected
+        :return: <np.memmap>
+        '''
+        self.drop('np.ndarray')
+        if not filename:
+            os.makedirs('var/tmp', exist_ok=True)
+            filename = f'var/tmp/{uuid.uuid4()}.npy'
+            self._tempfile = weakref.finalize(self, _removeFile, filename)
+
+        mm = None
+        # strip by strip, so no full size ndarray is ever built
+        for y in range(0, self.height, self.STRIP):
+            box = (0, y, self.width, min(y + self.STRIP, self.height))
+            strip = np.asarray(self.image.crop(box))
+            if mm is None:
+                shape = (self.height,) + strip.shape[1:]
+                mm = np.lib.format.open_memmap(filename, mode='w+',
+                                               dtype=strip.dtype, shape=shape)
+            mm[box[1]:box[3]] = strip
+        mm.flush()
+        self._forms['np.ndarray'] = mm
+        return mm
+
+    def tiles(self, tile=(512, 512)):
+        '''
+        walk the pixels tile by tile, views into _ndarray, nothing copied.
+
+        :return: generator of ((left, top, right, bottom), ndarray)
+        '''
+        arr = self._ndarray
+        tw, th = tile
+        for top in range(0, self.height, th):
+            for left in range(0, self.width, tw):
+                right = min(left + tw, self.width)
+                bottom = min(top + th, self.height)
+                yield (left, top, right, bottom), arr[top:bottom, left:right]
@@ -0,0 +1,140 @@
+__doc__ = '''vectorized pixel operations on uint8 arrays.
+
+every function takes one image, (H, W) for L or (H, W, 3|4) for RGB/RGBA,
+or a stack of them, (N, H, W) or (N, H, W, 3|4): a trailing axis of 3 or 4
+is taken for channels.
+
+`out=None` returns a new array, `out=arr` works in place,
+any other array of the right shape gets the result without allocation.
+alpha is left untouched unless said otherwise.
+'''
+import numpy as np
+
+
+def hasChannels(arr) -> bool:
+    return arr.ndim >= 3 and arr.shape[-1] in (3, 4)
+
+
+def hasAlpha(arr) -> bool:
+    return hasChannels(arr) and arr.shape[-1] == 4
+
+
+def _colors(arr):
+    '''
+    view of the color part, alpha excluded.
+    '''
+    return arr[..., :3] if hasAlpha(arr) else arr
+
+
+def _prepare(arr, out):
+    '''
+    alpha is copied over once, then only colors get written.
+    '''
+    if out is None:
+        out = np.empty_like(arr)
+    if out is not arr and hasAlpha(arr):
+        out[..., 3] = arr[..., 3]
+    return out
+
+
+def lut(arr, table, out=None, keep_alpha=True):
+    '''
+    map every value through a 256 entries table.
+    '''
+    table = np.asarray(table, dtype=np.uint8)
+    if keep_alpha:
+        out = _prepare(arr, out)
+        src, dst = _colors(arr), _colors(out)
+    else:
+        out = np.empty_like(arr) if out is None else out
+        src, dst = arr, out
+    # mode='clip' lets take() write straight into dst, no buffering
+    np.take(table, src, out=dst, mode='clip')
+    return out
+
+
+def invert(arr, out=None, keep_alpha=True):
+    if keep_alpha:
+        out = _prepare(arr, out)
+        np.invert(_colors(arr), out=_colors(out))
+    else:
+        out = np.invert(arr, out=out)
+    return out
+
+
+def threshold(arr, level=128, out=None, low=0, high=255):
+    '''
+    values >= level become `high`, the others `low`, per channel.
+    '''
+    table = np.where(np.arange(256) >= level, high, low)
+    return lut(arr, table, out=out)
+
+
+def brightnessContrast(arr, brightness=0, contrast=1.0, out=None):
+    '''
+    :param brightness: <int> added to every value, -255 ~ 255
+    :param contrast: <float> spread around 128, 1.0 keeps it as is
+    '''
+    table = (np.arange(256, dtype=np.float32) - 128) * contrast \
+        + 128 + brightness
+    return lut(arr, np.clip(np.rint(table), 0, 255), out=out)
+
+
+def channel(arr, index):
+    '''
+    view of one channel, no copy.
+    '''
+    return arr[..., index]
+
+
+def swapChannels(arr, order=(2, 1, 0), out=None):
+    '''
+    reorder color channels, RGB <-> BGR by default. alpha stays last.
+    '''
+    order = list(order)
+    if hasAlpha(arr) and len(order) == 3:
+        order.append(3)
+    if out is arr:
+        arr[...] = arr[..., order]
+        return arr
+    return np.take(arr, order, axis=-1, out=out)
+
+
+def toGray(arr, out=None):
+    '''
+    ITU-R 601 luma, (.., H, W, 3|4) -> (.., H, W)
+    '''
+    if not hasChannels(arr):
+        if out is None:
+            return arr.copy()
+        np.copyto(out, arr)
+        return out
+    weights = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    luma = arr[..., :3] @ weights
+    if out is None:
+        out = np.empty(arr.shape[:-1], dtype=np.uint8)
+    np.rint(luma, out=luma)
+    np.copyto(out, luma, casting='unsafe')
+    return out
+
+
+def pad(arr, top=0, bottom=0, left=0, right=0, value=0):
+    '''
+    grow the canvas, always a new array.
+
+    :param value: <int> or <tuple> per channel, e.g. (0, 0, 0, 255)
+    '''
+    h_axis = -3 if hasChannels(arr) else -2
+    shape = list(arr.shape)
+    shape[h_axis] += top + bottom
+    shape[h_axis + 1] += left + right
+
+    out = np.empty(shape, dtype=arr.dtype)
+    out[...] = value
+    rows = slice(top, top + arr.shape[h_axis])
+    cols = slice(left, left + arr.shape[h_axis + 1])
+    if hasChannels(arr):
+        out[..., rows, cols, :] = arr
+    else:
+        out[..., rows, cols] = arr
+    return out
@@ -1,12 +1,29 @@
 import socket
+import functools
 
 
-def getSelfIP():
+@functools.lru_cache(maxsize=None)
+def getSelfIP() -> str:
+    '''
+    address this host goes out from, worked out once per process.
+
+    connecting a UDP socket sends nothing, it only makes the kernel pick
+    a route; with no route at all, fall back on the hostname, then on
+    loopback, so going offline never breaks an import or a startup.
+    '''
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     try:
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         s.connect(('8.8.8.8', 80))
-        ip = s.getsockname()[0]
+        return s.getsockname()[0]
+    except OSError:
+        pass
     finally:
         s.close()
 
-    return ip
+    try:
+        ip = socket.gethostbyname(socket.gethostname())
+        if not ip.startswith('127.'):
+            return ip
+    except OSError:
+        pass
+    return '127.0.0.1'
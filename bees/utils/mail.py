@@ -1,21 +1,231 @@
 import os
+import queue
+import atexit
 import smtplib
+import weakref
+import threading
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
 from bees.utils.hub import ImageHub
 
 
+class MailDispatcher():
+    '''
+    Outgoing mail through one SMTP connection kept open and logged in,
+    fed by a queue a background thread empties in batches.
+
+    the connection is opened with the first mail, dropped after `idle`
+    seconds of nothing to send, and opened again whenever the server has
+    hung up on us, once per mail at most.
+
+    :param ssl: <bool> SMTP over SSL, e.g. port 465
+    :param starttls: <bool> plain SMTP upgraded with STARTTLS, e.g. port 587
+    :param user: <str> no login if None, e.g. against a local aiosmtpd
+    :param batch: <int> mails sent per wake-up at most
+    :param maxsize: <int> mails queued at most, `send` refuses beyond,
+                          and once closed
+    :param idle: <float> seconds before an unused connection is closed
+    '''
+
+    def __init__(self,
+                 host='smtp.qq.com',
+                 port=465,
+                 ssl=True,
+                 starttls=False,
+                 user=None,
+                 password=None,
+                 sender=None,
+                 batch=20,
+                 maxsize=1000,
+                 idle=60,
+                 timeout=30):
+        self.host = host
+        self.port = port
+        self.ssl = ssl
+        self.starttls = starttls
+        self.user = user
+        self.password = password
+        self.sender = sender or user
+        self.batch = batch
+        self.idle = idle
+        self.timeout = timeout
+        self.maxsize = maxsize
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.reconnects = 0
+        self.reset()
+        atexit.register(self.close)
+        # a forked child inherits the queue & connection, not the thread
+        ref = weakref.ref(self)
+        os.register_at_fork(after_in_child=lambda: ref() and ref().reset())
+
+    def reset(self):
+        '''
+        no worker, no connection and nothing queued, as in a fresh
+        process; what the parent queued is the parent's to send, over
+        the parent's connection.
+        '''
+        self.queue = queue.Queue(self.maxsize)
+        self.server = None
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.worker = None
+
+    def connect(self):
+        if self.server is not None:
+            return self.server
+        if self.ssl:
+            server = smtplib.SMTP_SSL(self.host, self.port,
+                                      timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                server.starttls()
+        if self.user:
+            try:
+                server.login(self.user, self.password)
+            except smtplib.SMTPException:
+                server.close()
+                raise
+        self.server = server
+        return server
+
+    def disconnect(self):
+        server, self.server = self.server, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except OSError:
+            server.close()
+
+    def send(self, msg, to=None, sender=None) -> bool:
+        '''
+        queue a mail, never touches the network.
+
+        :param msg: <email.message.Message>
+        :param to: <list> recipients, the To header by default
+        :return: <bool> False if the queue is full, or closed
+        '''
+        if self.stopped.is_set():
+            self.dropped += 1
+            return False
+        try:
+            self.queue.put_nowait((msg, to, sender or self.sender))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        if self.worker is None or not self.worker.is_alive():
+            self.start()
+        return True
+
+    def start(self):
+        with self.lock:
+            if self.stopped.is_set():
+                return
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(target=self.run,
+                                               name='MailDispatcher',
+                                               daemon=True)
+                self.worker.start()
+
+    def run(self):
+        while not (self.stopped.is_set() and self.queue.empty()):
+            try:
+                batch = [self.queue.get(timeout=self.idle)]
+            except queue.Empty:
+                # servers drop idle clients anyway, better do it ourselves
+                self.disconnect()
+                continue
+            while len(batch) < self.batch:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for item in batch:
+                try:
+                    if item is not None:
+                        self.deliver(*item)
+                        self.sent += 1
+                except Exception as e:
+                    self.failed += 1
+                    print(f'mail not sent: {e}')
+                finally:
+                    self.queue.task_done()
+        self.disconnect()
+
+    def deliver(self, msg, to=None, sender=None):
+        '''
+        send one mail right away, over the kept connection.
+        '''
+        for retry in (False, True):
+            try:
+                self.connect().send_message(msg, sender, to)
+                return
+            except smtplib.SMTPServerDisconnected as e:
+                error = e
+            except smtplib.SMTPException:
+                # refused by the server, a new connection won't change that
+                raise
+            except OSError as e:
+                error = e
+            # hung up on since last time, one fresh connection
+            self.disconnect()
+            if retry:
+                raise error
+            self.reconnects += 1
+
+    def flush(self):
+        '''
+        wait until every queued mail has been tried.
+        '''
+        self.queue.join()
+
+    def close(self):
+        '''
+        send whatever is queued, then hang up.
+        '''
+        self.stopped.set()
+        if self.worker is None:
+            return
+        try:
+            # wakes the worker up if it's waiting on an empty queue
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self.worker.join(self.timeout)
+
+
+# built from the environment on first use; assign one to send elsewhere
+DISPATCHER = None
+
+
+def getDispatcher() -> MailDispatcher:
+    global DISPATCHER
+    if DISPATCHER is None:
+        sender = os.environ.get('SENDER')
+        DISPATCHER = MailDispatcher(
+            host=os.environ.get('MAILHOST', 'smtp.qq.com'),
+            port=int(os.environ.get('MAILPORT', 465)),
+            user=sender,
+            password=os.environ.get('MAILPWD'))
+    return DISPATCHER
+
+
 def mailQRCode(uuid, status, qrcode):
     '''
+    mail the QR code to SENDER, queued and sent in the background.
 
     :param qrcode: generally anything that would be identified as picture
+    :return: <bool> True once queued
     '''
     print('mailQRCode called.')
 
     flag = True
-    sender = os.environ.get('SENDER')
-    pwd = os.environ.get('MAILPWD')
+    dispatcher = getDispatcher()
     print(f'uuid:{uuid} status:{status}')
 
     try:
@@ -24,19 +234,16 @@ def mailQRCode(uuid, status, qrcode):
         qrcode.add_header('Content-ID', '<qr-code>')
         msg = MIMEMultipart('related')
         msg['Subject'] = 'Scan your QR code! [Automatically sent by zworker]'
-        msg['From'] = sender
-        msg['To'] = sender
+        msg['From'] = dispatcher.sender
+        msg['To'] = dispatcher.sender
         text = MIMEText(f'<img src="cid:qr-code">', 'html', 'utf-8')
         msg.attach(text)
         msg.attach(qrcode)
         print('msg constructed.')
 
-        server = smtplib.SMTP_SSL("smtp.qq.com", 465)
-        login_info = server.login(sender, pwd)
-        print(login_info)
-        send_flag = server.sendmail(sender, [sender, ], msg.as_string())
-        print(f'mail sent: {not bool(send_flag)}')
-        server.quit()
-    except Exception:
+        flag = dispatcher.send(msg)
+        print(f'mail queued: {flag}')
+    except Exception as e:
+        print(e)
         flag = False
     return flag
@@ -0,0 +1,108 @@
+import time
+
+
+class Histogram():
+    '''
+    latencies in log2 buckets of microseconds: bucket i holds what took
+    less than 2**i us, so 32 ints cover up to ~70 minutes.
+    '''
+
+    BUCKETS = 32
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+
+    def observe(self, seconds: float):
+        index = min(int(seconds * 1e6).bit_length(), self.BUCKETS - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.slowest:
+            self.slowest = seconds
+
+    def percentile(self, q: float) -> float:
+        '''
+        :return: <float> seconds, upper bound of the bucket holding q
+        '''
+        wanted = q * self.count
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= wanted:
+                return min(2 ** index / 1e6, self.slowest)
+        return self.slowest
+
+    def snapshot(self) -> dict:
+        return {'count': self.count,
+                'mean': self.total / self.count if self.count else 0.0,
+                'p50': self.percentile(.5),
+                'p90': self.percentile(.9),
+                'p99': self.percentile(.99),
+                'max': self.slowest,
+                'buckets': {f'<{2 ** i}us': n
+                            for i, n in enumerate(self.counts) if n}}
+
+
+class Meter():
+    '''
+    counts & timings of a stream of handled messages.
+    '''
+
+    def __init__(self):
+        self.started = time.time()
+        self.received = 0
+        self.handled = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.slowest = 0.0
+        self.stages = {}
+
+    def time(self, stage: str, seconds: float):
+        '''
+        one more timing for a stage, e.g. `parse`
+        '''
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = Histogram()
+        histogram.observe(seconds)
+
+    def observe(self, seconds: float, ok: bool = True):
+        self.handled += 1
+        if not ok:
+            self.failed += 1
+        self.busy += seconds
+        if seconds > self.slowest:
+            self.slowest = seconds
+
+    @property
+    def throughput(self) -> float:
+        '''
+        handled messages per second since started
+        '''
+        elapsed = time.time() - self.started
+        return self.handled / elapsed if elapsed else 0.0
+
+    @property
+    def latency(self) -> float:
+        '''
+        mean seconds per handled message
+        '''
+        return self.busy / self.handled if self.handled else 0.0
+
+    def snapshot(self) -> dict:
+        return {'received': self.received,
+                'handled': self.handled,
+                'failed': self.failed,
+                'throughput': self.throughput,
+                'latency': self.latency,
+                'slowest': self.slowest,
+                'stages': {stage: histogram.snapshot() for stage, histogram
+                           in list(self.stages.items())}}
+
+    def __repr__(self):
+        return f'{self.handled}/{self.received} handled, \
+{self.failed} failed, {self.throughput:.1f} msg/s, \
+{self.latency * 1000:.2f} ms avg, {self.slowest * 1000:.2f} ms max'
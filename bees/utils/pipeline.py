@@ -0,0 +1,207 @@
+__doc__ = 'many ImageHubs on many cores'
+import os
+from collections import deque
+from multiprocessing import resource_tracker, shared_memory
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from PIL import Image
+
+from .hub import ImageHub
+
+
+class SharedArray():
+    '''
+    an ndarray parked in shared memory, only this small handle gets pickled.
+    '''
+
+    __slots__ = ('name', 'shape', 'dtype')
+
+    def __init__(self, name, shape, dtype):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+
+    @classmethod
+    def park(cls, arr):
+        arr = np.ascontiguousarray(arr)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes))
+        np.ndarray(arr.shape, arr.dtype, buffer=shm.buf)[...] = arr
+        shm.close()
+        return cls(shm.name, arr.shape, arr.dtype.str)
+
+    def fetch(self) -> np.ndarray:
+        '''
+        copy it out and free the shared block.
+        '''
+        shm = shared_memory.SharedMemory(name=self.name)
+        try:
+            return np.ndarray(self.shape, self.dtype, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def discard(self):
+        try:
+            shm = shared_memory.SharedMemory(name=self.name)
+        except FileNotFoundError:
+            return
+        shm.close()
+        shm.unlink()
+
+
+def _resize(hub, index, size):
+    return hub.resize(size)
+
+
+def _addBleed(hub, index, size, color='black'):
+    return hub.addBleed(size, color=color)
+
+
+def _invert(hub, index):
+    return ImageHub(ImageHub.invert(hub))
+
+
+def _save(hub, index, filename=None, format=None):
+    '''
+    :param filename: <str> may contain `{index}`
+    '''
+    if filename:
+        filename = filename.format(index=index)
+    return ImageHub.save(hub, filename, format=format)
+
+
+STEPS = {
+    'resize': _resize,
+    'addBleed': _addBleed,
+    'invert': _invert,
+    'save': _save,
+}
+
+
+def _work(index, source, steps):
+    '''
+    runs in a worker process.
+
+    :return: (index, value, error)
+    '''
+    try:
+        if isinstance(source, SharedArray):
+            source = source.fetch()
+        hub = ImageHub(source)
+        for step, kwargs in steps:
+            if not callable(step):
+                step = STEPS[step]
+            hub = step(hub, index, **kwargs)
+        if isinstance(hub, ImageHub):
+            hub = SharedArray.park(hub._ndarray)
+        return index, hub, None
+    except Exception as e:
+        return index, None, f'{type(e).__name__}: {e}'
+
+
+class BatchResult():
+    '''
+    :attr value: <np.ndarray> pixels, or whatever the last step returned,
+                              e.g. the filename of `save`
+    :attr error: <str> None if everything went fine
+    '''
+
+    __slots__ = ('index', 'value', 'error')
+
+    def __init__(self, index, value=None, error=None):
+        self.index = index
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        if self.ok:
+            return f'<BatchResult {self.index} ok>'
+        return f'<BatchResult {self.index} failed: {self.error}>'
+
+
+class ImagePipeline():
+    '''
+    run a chain of ImageHub operations over many inputs on a process pool.
+
+        pipe = ImagePipeline(['invert', ('resize', {'size': (512, 512)})])
+        for result in pipe.run(paths):
+            ...
+
+    pixels go to and from workers through shared memory, results come back
+    in input order, and at most `window` items are in flight at any time.
+
+    :param steps: names in STEPS, or (name, kwargs) tuples; a module level
+                  function taking (hub, index, **kwargs) works as a name
+    :param workers: <int> processes, all cores by default
+    :param window: <int> items in flight, twice the workers by default
+    '''
+
+    def __init__(self, steps, workers=None, window=None):
+        self.steps = [(s, {}) if not isinstance(s, tuple) else s
+                      for s in steps]
+        self.workers = workers or os.cpu_count()
+        self.window = window or self.workers * 2
+
+    @staticmethod
+    def _ship(source):
+        if isinstance(source, ImageHub):
+            source = source._ndarray
+        elif isinstance(source, Image.Image):
+            source = np.asarray(source)
+        if isinstance(source, np.ndarray):
+            return SharedArray.park(source)
+        return source
+
+    @staticmethod
+    def _collect(index, shipped, future) -> BatchResult:
+        try:
+            index, value, error = future.result()
+        except Exception as e:
+            # the worker may have died before fetching it
+            if isinstance(shipped, SharedArray):
+                shipped.discard()
+            return BatchResult(index, error=f'{type(e).__name__}: {e}')
+        if isinstance(value, SharedArray):
+            value = value.fetch()
+        return BatchResult(index, value, error)
+
+    def run(self, inputs):
+        '''
+        :return: generator of BatchResult, in the order of `inputs`
+        '''
+        # workers must share our tracker, or they'd reap blocks we still read
+        resource_tracker.ensure_running()
+        pending = deque()
+        with ProcessPoolExecutor(self.workers) as pool:
+            try:
+                for index, source in enumerate(inputs):
+                    shipped = self._ship(source)
+                    try:
+                        future = pool.submit(_work, index, shipped,
+                                             self.steps)
+                    except BrokenProcessPool as e:
+                        # a worker died, this one fails as the rest did
+                        future = Future()
+                        future.set_exception(e)
+                    pending.append((index, shipped, future))
+                    if len(pending) >= self.window:
+                        yield self._collect(*pending.popleft())
+                while pending:
+                    yield self._collect(*pending.popleft())
+            finally:
+                # left early: free whatever the workers still parked
+                for _, shipped, future in pending:
+                    value = shipped
+                    if not future.cancel():
+                        try:
+                            value = future.result()[1]
+                        except Exception:
+                            pass
+                    if isinstance(value, SharedArray):
+                        value.discard()
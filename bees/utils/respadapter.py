@@ -1,8 +1,35 @@
 __doc__ = 'for adapting 3 main types of resp: requests, baidubce & bumblebee'
-import json
 from requests import Response as RequestsResponse
+from requests.utils import get_encoding_from_headers
+from requests.structures import CaseInsensitiveDict
 
-from .sac import SelfAssemblingClass
+from .sac import SelfAssemblingClass, assemble
+from .fastjson import loads
+
+
+def buildResponse(status: int,
+                  headers=None,
+                  content: bytes = b'',
+                  url: str = None,
+                  reason: str = None) -> RequestsResponse:
+    '''
+    Assemble a `requests.Response` out of plain parts,
+    so that anything else could be fed into GeneralResp.
+
+    :param headers: <dict> or any mapping of response headers
+    '''
+    resp = RequestsResponse()
+    resp.status_code = status
+    resp.headers = CaseInsensitiveDict(headers or {})
+    resp.encoding = get_encoding_from_headers(resp.headers)
+    resp._content = content
+    resp._content_consumed = True
+    resp.url = url
+    resp.reason = reason
+    return resp
+
+
+_UNDECODED = object()
 
 
 class GeneralResp():
@@ -11,9 +38,16 @@ class GeneralResp():
     0. if everything is ok, directly access this for json
     1. if something wrong, giving out the raw resp for debugging
         thus: not isinstance(this, dict)
+
+    the body is decoded on first attribute access, never before;
+    RAW_FIRST attributes always come from the raw resp without decoding.
     '''
 
-    def __new__(self, resp):
+    __slots__ = ('_resp', '_decoded')
+
+    RAW_FIRST = frozenset(('status_code', 'headers', '_content', 'encoding'))
+
+    def __new__(cls, resp):
         '''
         :param resp: one of the three type of resps
         '''
@@ -22,18 +56,51 @@ class GeneralResp():
                                                                GeneralResp):
             return resp
         elif isinstance(resp, RequestsResponse):
-            print(f'assembling a requests.Response obj...')
-            try:
-                doc = json.loads(resp.content)
-                print('doc seems ok, pass it for assembling...')
-                return SelfAssemblingClass(doc)
-            except Exception:
-                print('assembling a requests.Response')
-                return SelfAssemblingClass(resp.__dict__)
+            self = object.__new__(cls)
+            self._resp = resp
+            self._decoded = _UNDECODED
+            return self
         else:
             print(
                 f'respadapter.GeneralResp: input must be some Response <obj>,\
                      got a {type(resp)}')
 
+    @property
+    def _json(self):
+        '''
+        the decoded body, None if it is not json.
+        '''
+        if self._decoded is _UNDECODED:
+            try:
+                self._decoded = loads(self._resp.content)
+            # JSONDecodeError, or UnicodeDecodeError from json on bytes
+            # that aren't utf-8, are both ValueErrors
+            except (ValueError, TypeError):
+                self._decoded = None
+        return self._decoded
+
+    def __getattr__(self, name):
+        if name in GeneralResp.__slots__ or name.startswith('__'):
+            raise AttributeError(name)
+        if name not in self.RAW_FIRST:
+            doc = self._json
+            if isinstance(doc, dict) and name in doc:
+                return assemble(doc[name])
+        return getattr(self._resp, name)
+
+    def __reduce__(self):
+        return GeneralResp, (self._resp,)
+
+    def __getitem__(self, key):
+        return assemble(self._json[key])
+
     def __contains__(self, item):
-        return item in self.__dict__.keys()
+        doc = self._json
+        if isinstance(doc, dict):
+            return item in doc
+        return item in self._resp.__dict__
+
+    def __repr__(self):
+        doc = self._json
+        keys = doc if isinstance(doc, dict) else self._resp.__dict__
+        return f'attrs: {[k for k in keys].__str__()}'
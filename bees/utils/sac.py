@@ -1,5 +1,5 @@
 import json
-from requests.structures import CaseInsensitiveDict
+from collections.abc import Mapping
 
 
 def loadIfJson(_input: str) -> bool:
@@ -11,21 +11,115 @@ def loadIfJson(_input: str) -> bool:
         return False
 
 
+def assemble(value):
+    '''
+    wrap dicts & lists in views, leave anything else alone.
+    '''
+    if isinstance(value, dict):
+        return SelfAssemblingClass(value)
+    elif isinstance(value, list):
+        return SelfAssemblingList(value)
+    return value
+
+
+def plain(value):
+    if isinstance(value, (SelfAssemblingClass, SelfAssemblingList)):
+        value = value._doc
+    if isinstance(value, Mapping):
+        return {k: plain(v) for k, v in value.items()}
+    elif isinstance(value, list):
+        return [plain(v) for v in value]
+    return value
+
+
 class SelfAssemblingClass():
     '''
-    recursively assemble everything up
+    recursively assemble everything up, on access:
+    nested dicts & lists come back wrapped, nothing is ever copied.
+
+    read-only, use to_dict() for a plain copy to play with.
     '''
 
+    __slots__ = ('_doc',)
+
     def __init__(self, doc=None):
-        if isinstance(doc, dict):
-            self.__dict__ = doc.copy()
+        if isinstance(doc, Mapping):
+            pass
         elif hasattr(doc, '__dict__'):
-            self.__dict__ = doc.__dict__.copy()
-        elif isinstance(doc, CaseInsensitiveDict):
-            self.__dict__ = dict(doc)
+            doc = vars(doc)
+        else:
+            doc = {}
+        object.__setattr__(self, '_doc', doc)
+
+    def __getattr__(self, name):
+        if name == '_doc' or name.startswith('__'):
+            raise AttributeError(name)
+        try:
+            return assemble(self._doc[name])
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __getitem__(self, key):
+        return assemble(self._doc[key])
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is read-only')
+
+    __delattr__ = __setattr__
+
+    def __reduce__(self):
+        return SelfAssemblingClass, (self._doc,)
+
+    def __contains__(self, item):
+        return item in self._doc
+
+    def __iter__(self):
+        return iter(self._doc)
+
+    def __len__(self):
+        return len(self._doc)
+
+    def __repr__(self):
+        return f'attrs: {[k for k in self._doc.keys()].__str__()}'
+
+    def to_dict(self) -> dict:
+        return plain(self._doc)
+
+
+class SelfAssemblingList():
+    '''
+    the list counterpart, items wrapped on access.
+    '''
+
+    __slots__ = ('_doc',)
+
+    def __init__(self, doc=None):
+        object.__setattr__(self, '_doc', doc if doc is not None else [])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return SelfAssemblingList(self._doc[index])
+        return assemble(self._doc[index])
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is read-only')
+
+    __delattr__ = __setattr__
+
+    def __reduce__(self):
+        return SelfAssemblingList, (self._doc,)
 
     def __contains__(self, item):
-        return item in self.__dict__.keys()
+        return item in self._doc
+
+    def __iter__(self):
+        return map(assemble, self._doc)
+
+    def __len__(self):
+        return len(self._doc)
 
     def __repr__(self):
-        return f'attrs: {[k for k in self.__dict__.keys()].__str__()}'
+        return f'items: {len(self._doc)}'
+
+    def to_list(self) -> list:
+        return plain(self._doc)
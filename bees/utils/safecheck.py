@@ -1,65 +1,203 @@
 import time
+import inspect
 import functools
+import itertools
+import threading
+from uuid import uuid4
 from random import random
+from urllib.parse import urlsplit
+
+
+class TokenBucket():
+    '''
+    `rate` tokens per second, holding at most `burst` of them.
+
+    a taker always gets its token at once and is told how long to wait
+    before using it, so concurrent takers line up instead of racing.
+    '''
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        '''
+        :return: <float> seconds to wait before the token is really ours
+        '''
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst,
+                              self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class HostLimiter():
+    '''
+    One TokenBucket per host.
+
+    :param rate: <float> requests per second for every host
+    :param burst: <int> requests allowed back to back
+    :param jitter: <float> up to this many extra seconds,
+                           added only when there is a wait anyway
+    :param hosts: <dict> {host: (rate, burst)} overrides
+    '''
+
+    def __init__(self, rate=2.0, burst=4, jitter=0.0, hosts=None):
+        self.rate = rate
+        self.burst = burst
+        self.jitter = jitter
+        self.hosts = hosts or {}
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, host: str) -> TokenBucket:
+        with self.lock:
+            if host not in self.buckets:
+                rate, burst = self.hosts.get(host, (self.rate, self.burst))
+                self.buckets[host] = TokenBucket(rate, burst)
+            return self.buckets[host]
+
+    def reserve(self, url: str) -> float:
+        '''
+        non-blocking: take a token for url's host.
+
+        :return: <float> seconds the caller should wait
+        '''
+        delay = self.bucket(urlsplit(url).netloc).reserve()
+        if delay and self.jitter:
+            delay += random() * self.jitter
+        return delay
+
+    def wait(self, url: str) -> float:
+        delay = self.reserve(url)
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    async def asyncWait(self, url: str) -> float:
+        import asyncio
+        delay = self.reserve(url)
+        if delay:
+            await asyncio.sleep(delay)
+        return delay
+
+
+# shared by every bee unless it brings its own `limiter`
+LIMITER = HostLimiter()
 
 
 def slowDown(func):
     '''
-    Speed control.
+    Speed control, per host, for both plain and async methods.
     '''
+    def pick(self, args, kw):
+        url = args[0] if args else kw.get('url', '')
+        limiter = getattr(self, 'limiter', None) or LIMITER
+        return limiter, url
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def awrapper(self, *args, **kw):
+            limiter, url = pick(self, args, kw)
+            await limiter.asyncWait(url)
+            return await func(self, *args, **kw)
+        return awrapper
+
     @functools.wraps(func)
     def wrapper(self, *args, **kw):
-        slowness = random() + random() + random()
-        time.sleep(slowness)
-        print(f'idiot, slow down...{slowness:.2f}')
+        limiter, url = pick(self, args, kw)
+        limiter.wait(url)
         return func(self, *args, **kw)
     return wrapper
 
 
+# KEYS[1]: zset of actions, scored by microseconds
+# ARGV[1]: unique member suffix, ARGV[2..]: window seconds, limit, ...
+# returns microseconds to wait, 0 means the action got recorded
+WINDOW_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000000 + tonumber(t[2])
+local key = KEYS[1]
+local longest = 0
+for i = 2, #ARGV, 2 do
+    longest = math.max(longest, tonumber(ARGV[i]) * 1000000)
+end
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - longest)
+
+local wait = 0
+for i = 2, #ARGV, 2 do
+    local window = tonumber(ARGV[i]) * 1000000
+    local limit = tonumber(ARGV[i + 1])
+    local since = '(' .. string.format('%d', now - window)
+    local count = redis.call('ZCOUNT', key, since, '+inf')
+    if count >= limit then
+        local oldest = redis.call('ZRANGEBYSCORE', key, since, '+inf',
+                                  'WITHSCORES', 'LIMIT', count - limit, 1)
+        wait = math.max(wait, tonumber(oldest[2]) + window - now)
+    end
+end
+
+if wait > 0 then
+    return math.ceil(wait)
+end
+redis.call('ZADD', key, now, string.format('%d', now) .. ':' .. ARGV[1])
+redis.call('PEXPIRE', key, math.ceil(longest / 1000))
+return 0
+"""
+
+
+class WindowLimiter():
+    '''
+    Sliding window actions limit kept in redis,
+    every window checked and the action recorded in one round-trip.
+
+    the clock is redis' own, so bees on many hosts may share it.
+
+    :param r: <redis.Redis>
+    :param windows: <tuple> ((seconds, max actions), ...)
+    '''
+
+    WINDOWS = ((300, 100), (1800, 1000), (3600, 2000), (86400, 9999))
+
+    def __init__(self, r, key='actions:window', windows=None):
+        self.key = key
+        self.windows = windows or self.WINDOWS
+        self.script = r.register_script(WINDOW_SCRIPT)
+        self.token = uuid4().hex
+        self.counter = itertools.count()
+        self.args = [n for window in self.windows for n in window]
+
+    def hit(self) -> float:
+        '''
+        :return: <float> 0 if the action is allowed (and recorded),
+                         else the seconds until it would be
+        '''
+        member = f'{self.token}:{next(self.counter)}'
+        wait = self.script(keys=[self.key], args=[member] + self.args)
+        return int(wait) / 1e6
+
+
 def safeCheck(func):
     '''
-    Global actions limit.
+    Global actions limit, shared through `self.r`.
     '''
     @functools.wraps(func)
     def wrapper(self, *args, **kw):
-        nap = 0
-
-        # check if the 100th action is within last 5 mins
-        the_100th_action = self.r.lindex('actions', 100)
-        the_1kth_action = self.r.lindex('actions', 1000)
-        the_2kth_action = self.r.lindex('actions', 2000)
-        if self.r.llen('actions') == 9999:
-            the_10kth_action = self.r.lindex('actions', -1)
-        else:
-            the_10kth_action = None
-
-        if the_100th_action:
-            if time.time() - float(the_100th_action) <= 300:
-                nap = random()*200
-                info = f'reach the 5mins limit. \
-                    gotta take a {nap} secs nap.'
-        elif the_1kth_action:
-            if time.time() - float(the_1kth_action) <= 1800:
-                nap = random()*999
-                info = f'reach the 30mins limit. \
-                    gotta take a {nap} secs nap.'
-        elif the_2kth_action:
-            if time.time() - float(the_2kth_action) <= 3600:
-                nap = random()*1989
-                info = f'reach the 60mins limit. \
-                    gotta take a {nap} secs nap.'
-        elif the_10kth_action:
-            if time.time() - float(the_10kth_action) <= 86400:
-                nap = random()*12306
-                info = f'reach the 24hrs limit. \
-                    gotta take a {nap} secs nap.'
-        else:
-            nap = 0
-
-        if nap:
-            print(info)
+        if getattr(self, '_window_limiter', None) is None:
+            self._window_limiter = WindowLimiter(self.r)
+
+        nap = self._window_limiter.hit()
+        while nap:
+            print(f'reach the actions limit. gotta take a {nap:.1f} secs nap.')
             time.sleep(nap)
-        else:
-            print('safeCheck passed.')
-            return func(self, *args, **kw)
+            nap = self._window_limiter.hit()
+        return func(self, *args, **kw)
     return wrapper
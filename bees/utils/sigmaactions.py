@@ -1,17 +1,172 @@
-import redis
+import os
+import atexit
+import weakref
+import threading
+from collections import deque
+
+
+class ActionRecorder():
+    '''
+    Process-wide buffer of actions timenodes, flushed to redis in the
+    background through one pipeline per batch.
+
+    :param maxlen: <int> buffered actions kept when redis can't keep up,
+                         the oldest ones are dropped first
+    :param interval: <float> seconds between two flushes
+    :param keep: <int> actions kept in the redis list
+    '''
+
+    def __init__(self,
+                 host='localhost',
+                 port=6379,
+                 db=0,
+                 key='actions',
+                 maxlen=10000,
+                 interval=1.0,
+                 keep=9999):
+        self.key = key
+        self.keep = keep
+        self.interval = interval
+        self.buffer = deque(maxlen=maxlen)
+        self.dropped = 0
+        self.redis_kwargs = {'host': host, 'port': port, 'db': db}
+        self._r = None
+        # redis.RedisError once redis is imported, catches nothing until then
+        self._errors = ()
+        # exit hooks outlive forks, see hook
+        self.hooked = False
+        self.reset()
+        # a forked child inherits the buffer & flusher, not the thread
+        ref = weakref.ref(self)
+        os.register_at_fork(after_in_child=lambda: ref() and ref().reset())
+
+    def reset(self):
+        '''
+        no flusher and nothing buffered, as in a fresh process;
+        what the parent buffered is the parent's to write.
+        '''
+        self.buffer.clear()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.flusher = None
+
+    @property
+    def r(self):
+        '''
+        redis gets imported with the first flush, not with bees.
+        '''
+        if self._r is None:
+            import redis
+            self._errors = redis.RedisError
+            self.cpool = redis.ConnectionPool(decode_responses=True,
+                                              **self.redis_kwargs)
+            self._r = redis.Redis(connection_pool=self.cpool)
+        return self._r
+
+    def record(self, occur):
+        '''
+        never touches the network, just buffers.
+        '''
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(occur)
+        if self.flusher is None or not self.flusher.is_alive():
+            self.start()
+
+    def start(self):
+        with self.lock:
+            if self.stopped.is_set():
+                return
+            if self.flusher is None or not self.flusher.is_alive():
+                self.flusher = threading.Thread(target=self.run,
+                                                name='sigmaActions',
+                                                daemon=True)
+                self.flusher.start()
+                if not self.hooked:
+                    self.hook()
+
+    def hook(self):
+        '''
+        close on the way out, registered once per process, with the first
+        flusher rather than on import, multiprocessing being no light one.
+        '''
+        self.hooked = True
+        atexit.register(self.close)
+        # multiprocessing children leave through os._exit, skipping
+        # atexit, but they do run these finalizers; a forked one gets its
+        # own after multiprocessing has cleared what it inherited
+        from multiprocessing import util, parent_process
+        if parent_process() is not None:
+            self.finalize()
+        util.register_after_fork(self, ActionRecorder.finalize)
+
+    def finalize(self):
+        from multiprocessing import util
+        util.Finalize(self, self.close, exitpriority=10)
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except ImportError as e:
+                # nowhere to flush to, and no use trying every interval
+                print(f'sigmaActions off: {e}')
+                self.stopped.set()
+            except self._errors as e:
+                print(f'sigmaActions flush failed: {e}')
+
+    def flush(self) -> int:
+        '''
+        :return: <int> number of actions written
+        '''
+        if not self.buffer:
+            return 0
+        # first, so that a missing redis leaves the buffer as it is
+        r = self.r
+        batch = []
+        while self.buffer:
+            batch.append(self.buffer.popleft())
+        if not batch:
+            return 0
+
+        try:
+            pipe = r.pipeline(transaction=False)
+            # newest ends up at the head, same as one lpush per action
+            pipe.lpush(self.key, *batch)
+            pipe.ltrim(self.key, 0, self.keep)
+            pipe.execute()
+        except self._errors:
+            # put it back in front, dropping its oldest part if no room
+            room = self.buffer.maxlen - len(self.buffer)
+            self.dropped += max(0, len(batch) - room)
+            self.buffer.extendleft(reversed(batch[len(batch) - room:]))
+            raise
+        return len(batch)
+
+    def close(self):
+        '''
+        stop the flusher and write whatever is left.
+        '''
+        self.stopped.set()
+        self.wakeup.set()
+        if self.flusher is not None:
+            self.flusher.join(self.interval + 1)
+        try:
+            self.flush()
+        except ImportError:
+            pass
+        except self._errors as e:
+            print(f'sigmaActions final flush failed: {e}')
+
+
+RECORDER = ActionRecorder()
 
 
 def sigmaActions(occur):
     '''
     Every small step counts.
     '''
-    cpool = redis.ConnectionPool(host='localhost',
-                             port=6379,
-                             decode_responses=True,
-                             db=0,)
-    r = redis.Redis(connection_pool=cpool)
-
-    r.lpush('actions', occur)
-    # record last 9999 actions timenode
-    if r.llen('actions') > 9999:
-        r.ltrim('actions', 0, 9999)
+    RECORDER.record(occur)
@@ -0,0 +1,105 @@
+__doc__ = 'turning html bytes into trees with as little work as possible'
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+
+CHARSET = re.compile(r'charset=["\']?([\w.:-]+)', re.I)
+
+
+def charsetFromHeaders(headers) -> str:
+    '''
+    :return: <str> charset named by Content-Type, None if it names none
+    '''
+    match = CHARSET.search((headers or {}).get('Content-Type', ''))
+    return match.group(1) if match else None
+
+
+class SoupCache():
+    '''
+    LRU of parsed documents keyed by body hash,
+    so an unchanged page is never parsed twice.
+
+    cached trees are shared, don't modify what you get from here.
+    '''
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.docs = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            doc = self.docs.get(key)
+            if doc is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.docs.move_to_end(key)
+            return doc
+
+    def put(self, key, doc):
+        with self.lock:
+            self.docs[key] = doc
+            self.docs.move_to_end(key)
+            while len(self.docs) > self.maxsize:
+                self.docs.popitem(last=False)
+
+
+SOUPS = SoupCache()
+
+
+def cookSoup(content: bytes,
+             headers=None,
+             mode: str = 'soup',
+             only=None,
+             cache: SoupCache = None):
+    '''
+    :return: BeautifulSoup, or lxml.html element (list of them with `only`)
+
+    :param content: <bytes> raw body, decoded here by its real charset:
+                            Content-Type first, then <meta>, then guessing
+    :param mode: <str> `soup` for BeautifulSoup,
+                       `lxml` for a bare lxml.html tree, way faster
+    :param only: soup mode: a SoupStrainer, or tag name(s) / attrs dict to
+                            build one, everything else is never parsed
+                 lxml mode: an XPath, matching elements are returned
+    :param cache: <SoupCache> e.g. SOUPS, None for no caching; cached
+                              trees are shared, treat them as read-only
+    '''
+    charset = charsetFromHeaders(headers)
+    key = None
+    if cache is not None:
+        digest = hashlib.sha1(content).digest()
+        key = (digest, mode, charset, str(only))
+        doc = cache.get(key)
+        if doc is not None:
+            return doc
+
+    if mode == 'lxml':
+        import lxml.html
+        try:
+            parser = lxml.html.HTMLParser(encoding=charset)
+        except LookupError:
+            # a charset lxml doesn't know, e.g. utf8mb4: let it guess
+            parser = lxml.html.HTMLParser(encoding=None)
+        doc = lxml.html.document_fromstring(content, parser=parser)
+        if only:
+            doc = doc.xpath(only)
+    elif mode == 'soup':
+        from bs4 import BeautifulSoup, SoupStrainer
+        if only is not None and not isinstance(only, SoupStrainer):
+            if isinstance(only, dict):
+                only = SoupStrainer(attrs=only)
+            else:
+                only = SoupStrainer(only)
+        doc = BeautifulSoup(content, 'lxml',
+                            from_encoding=charset, parse_only=only)
+    else:
+        raise ValueError(f'unknown soup mode {mode}')
+
+    if key is not None:
+        cache.put(key, doc)
+    return doc
@@ -0,0 +1,125 @@
+__doc__ = 'files put back together from streamed chunks, see utils.envelope'
+import os
+import re
+import time
+
+# stream ids are uuid4().hex, see envelope.Stream
+STREAM_ID = re.compile(r'[0-9a-f]{32}')
+
+
+class Spool():
+    '''
+    chunks are written at their offset as they arrive, in any order, so
+    a file is never held in memory; it's ready once `count` chunks are in.
+
+    files are named <stream id>-<name>, same names never clash. whoever
+    adopts a file owns it, release() then deletes it.
+
+    headers come from whoever can reach the socket: a chunk only ever
+    lands inside its own file, within the `size` it announced.
+
+    :param directory: <str> where files land
+    :param timeout: <float> seconds a stream may go quiet before its
+                            partial file is thrown away
+    :param max_size: <int> bytes a streamed file may have at most
+    :param max_chunk: <int> bytes a chunk may have at most
+    '''
+
+    def __init__(self, directory='var/zbee', timeout=600,
+                 max_size=4 * 1024 ** 3, max_chunk=64 * 1024 ** 2):
+        self.directory = directory
+        self.timeout = timeout
+        self.max_size = max_size
+        self.max_chunk = max_chunk
+        self.streams = {}
+        self.owned = set()
+        self.swept = time.time()
+
+    def add(self, header: dict, body) -> str:
+        '''
+        :param header: <dict> of a `chunk` message
+        :return: <str> path of the file once complete, None until then
+        :raise ValueError: for a chunk that doesn't fit its stream
+        '''
+        stream, seq, count, chunk_size, size = self.check(header)
+        offset = seq * chunk_size
+        if offset + len(body) > size or len(body) > chunk_size:
+            raise ValueError(f'chunk {seq} of stream {stream} '
+                             f'overruns its {size} bytes')
+        state = self.streams.get(stream)
+        if state is None:
+            os.makedirs(self.directory, exist_ok=True)
+            name = os.path.basename(str(header.get('name') or 'file'))
+            path = os.path.join(self.directory, f'{stream}-{name}')
+            open(path, 'wb').close()
+            state = self.streams[stream] = {'path': path, 'seen': set(),
+                                            'shape': (count, chunk_size,
+                                                      size)}
+        elif state['shape'] != (count, chunk_size, size):
+            raise ValueError(f'chunk {seq} of stream {stream} '
+                             f'disagrees with the ones before')
+
+        with open(state['path'], 'r+b') as f:
+            f.seek(offset)
+            f.write(body)
+        state['seen'].add(seq)
+        state['touched'] = time.time()
+
+        if len(state['seen']) == count:
+            del self.streams[stream]
+            return state['path']
+        if state['touched'] - self.swept > self.timeout:
+            self.sweep()
+        return None
+
+    def check(self, header: dict) -> tuple:
+        '''
+        :return: (stream, seq, count, chunk_size, size) of a chunk header
+        :raise ValueError: if any of them is off
+        '''
+        stream = header.get('stream')
+        if not isinstance(stream, str) or not STREAM_ID.fullmatch(stream):
+            raise ValueError(f'bad stream id {stream!r}')
+        numbers = [header.get(key)
+                   for key in ('seq', 'count', 'chunk_size', 'size')]
+        if not all(type(n) is int for n in numbers):
+            raise ValueError(f'bad chunk header for stream {stream}')
+        seq, count, chunk_size, size = numbers
+        if not 0 < chunk_size <= self.max_chunk:
+            raise ValueError(f'chunk size {chunk_size} out of bounds')
+        if not 0 <= size <= self.max_size:
+            raise ValueError(f'file size {size} out of bounds')
+        if count != max(1, -(-size // chunk_size)):
+            raise ValueError(f'{count} chunks of {chunk_size} bytes '
+                             f'are not {size} bytes')
+        if not 0 <= seq < count:
+            raise ValueError(f'chunk {seq} of {count} out of bounds')
+        return stream, seq, count, chunk_size, size
+
+    def sweep(self):
+        '''
+        drop streams quiet for longer than timeout, their sender is gone.
+        '''
+        self.swept = time.time()
+        for stream, state in list(self.streams.items()):
+            if self.swept - state['touched'] > self.timeout:
+                del self.streams[stream]
+                self._remove(state['path'])
+
+    def adopt(self, path: str):
+        self.owned.add(path)
+
+    def release(self, path):
+        '''
+        delete path if it's ours, anything else is left alone.
+        '''
+        if isinstance(path, str) and path in self.owned:
+            self.owned.discard(path)
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
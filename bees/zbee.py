@@ -1,101 +1,727 @@
 import os
 import zmq
+import json
 import time
-import redis
 import random
+import struct
+import threading
+import multiprocessing
+from collections import deque
 
 from .utils.ip import getSelfIP
-from bees.hbee import HealthBee
+from .utils.meters import Meter
+from .utils.backlog import Backlog
+from .utils.spool import Spool
+from .utils.envelope import seal, unseal, sendFrames, Stream
 
+# what unpackage gives for a chunk of a file not complete yet
+PENDING = object()
 
 
+def __getattr__(name):
+    # AsyncZBee brings asyncio along, sync bees shouldn't pay for it
+    if name == 'AsyncZBee':
+        from .azbee import AsyncZBee
+        return AsyncZBee
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
 
 class ZBeeError(Exception):
     pass
 
 
+class lazyClassAttr():
+    '''
+    class attribute worked out on first access, then kept on the class
+    that defines it, so importing does no network and no redis.
+    '''
+
+    def __init__(self, func):
+        self.func = func
+
+    def __set_name__(self, owner, name):
+        self.owner = owner
+        self.name = name
+
+    def __get__(self, obj, cls):
+        value = self.func(self.owner)
+        setattr(self.owner, self.name, value)
+        return value
+
+
+def attach(socket, endpoint: str):
+    '''
+    `@tcp://...` binds, `>tcp://...` or a bare one connects.
+    '''
+    if endpoint.startswith('@'):
+        socket.bind(endpoint[1:])
+    else:
+        socket.connect(endpoint.lstrip('>'))
+
+
 class ZBee():
 
     '''
     bytes in bytes out.
     '''
-    IP = getSelfIP()
 
-    cpool = redis.ConnectionPool(host='localhost', port=6379,
-                                 decode_responses=True, db=5)
-    r = redis.Redis(connection_pool=cpool)
+    @lazyClassAttr
+    def IP(cls):
+        return getSelfIP()
 
-    def __init__(self):
+    # messages taken per wake-up at most, so a flood can't starve the rest
+    BATCH = 100
+    POLL_TIMEOUT = 1000
+
+    # files travel in chunks of this size, and land in SPOOL until
+    # delivered; a stream quiet for SPOOL_TIMEOUT seconds is given up
+    CHUNK_SIZE = 1024 * 1024
+    SPOOL = 'var/zbee'
+    SPOOL_TIMEOUT = 600
+
+    # messages zmq queues per socket before pushing back
+    SNDHWM = 1000
+    RCVHWM = 1000
+    # messages taken off the socket but not handled yet, and what to do
+    # once there are that many: block, drop or spill, see utils.backlog
+    BACKLOG = 10000
+    OVERFLOW = 'block'
+
+    # out-of-band commands, see `command`
+    CONTROL_PORT = 5556
+    COMMANDS = ('health', 'stats', 'drain', 'shutdown')
+
+    # seconds between two stats written to redis, 0 for never
+    METRICS_EVERY = 10
+
+    @lazyClassAttr
+    def cpool(cls):
+        import redis
+        return redis.ConnectionPool(host='localhost', port=6379,
+                                    decode_responses=True, db=5)
+
+    @lazyClassAttr
+    def r(cls):
+        import redis
+        return redis.Redis(connection_pool=cls.cpool)
+
+    def __init__(self, source=None, sink=None, overflow=None, control=None,
+                 hive=None, start=True):
+        '''
+        endpoints bind when starting with `@`, connect otherwise.
+
+        :param source: <str> where to pull from,
+                             @tcp://IP:ZPIPE_IN_PORT by default
+        :param sink: <str> where to push to,
+                           >tcp://IP:ZPIPE_OUT_PORT by default
+        :param overflow: <str> block, drop or spill, OVERFLOW by default
+        :param control: <str> where commands are answered,
+                              @tcp://IP:CONTROL_PORT by default,
+                              False for no control socket
+        :param hive: <str> a ZBeeHive's distribute endpoint to take work
+                           from, instead of `source`
+        :param start: <bool> run right away, blocking until stopped;
+                             False to call run() later
+        '''
         # self.ZPIPE_IN_PORT = self.pipe_receiver.bind_to_random_port(f'tcp://{self.IP}')
         # self.ZPIPE_OUT_PORT = self.ZPIPE_IN_PORT + 1
         self.ZPIPE_IN_PORT = 5557
         self.ZPIPE_OUT_PORT = 5558
+        source = source or f'@tcp://{self.IP}:{self.ZPIPE_IN_PORT}'
+        sink = sink or f'>tcp://{self.IP}:{self.ZPIPE_OUT_PORT}'
+        if control is None:
+            control = f'@tcp://{self.IP}:{self.CONTROL_PORT}'
 
-        self.context = zmq.Context.instance()
-        self.pipe_receiver = self.context.socket(zmq.PULL)
-        self.pipe_receiver.bind(f'tcp://{self.IP}:{self.ZPIPE_IN_PORT}')
+        self.context = self._context()
+        self.hive = hive
+        if hive:
+            # probes on (re)connecting, so the hive's ROUTER knows about
+            # us and can hand us every chunk of a stream
+            self.pipe_receiver = self.context.socket(zmq.DEALER)
+            self.pipe_receiver.setsockopt(zmq.PROBE_ROUTER, 1)
+            source = hive
+        else:
+            self.pipe_receiver = self.context.socket(zmq.PULL)
+        self.pipe_receiver.setsockopt(zmq.RCVHWM, self.RCVHWM)
+        attach(self.pipe_receiver, source)
         self.semi = self.context.socket(zmq.PUSH)
-        self.semi.connect(f'tcp://{self.IP}:{self.ZPIPE_OUT_PORT}')
+        self.semi.setsockopt(zmq.SNDHWM, self.SNDHWM)
+        attach(self.semi, sink)
+
+        self.control = None
+        if control:
+            self.control = self.context.socket(zmq.REP)
+            attach(self.control, control)
 
-        print(f'pipe_receiver bind to tcp://{self.IP}:{self.ZPIPE_IN_PORT}')
-        print(f'semi connected to tcp://{self.IP}:{self.ZPIPE_OUT_PORT}')
+        print(f'pipe_receiver on {source}')
+        print(f'semi on {sink}')
+        if control:
+            print(f'control on {control}')
 
         os.environ.update({'ZPIPE_IN_PORT':str(self.ZPIPE_IN_PORT)})
         os.environ.update({'ZPIPE_OUT_PORT':str(self.ZPIPE_OUT_PORT)})
         print(f'in and out ports updated into os.environ')
 
+        from bees.hbee import HealthBee
         self.hbee = HealthBee('zbee')
         print(f'hbee started running...')
 
-        while True:
-            time.sleep(0.1)
-            print(f'pipe_receiver gonna go recv()...')
-            data = self.pipe_receiver.recv()
-            data = data.decode()
-            if 'checkServiceStatus' in data:
-                self.hbee.healthCheck()
-            else:
-                print(f'received from {self.ZPIPE_IN_PORT}: {data}')
-                self.handle(data)
+        self.state = 'running'
+        self.spool = Spool(self.SPOOL, self.SPOOL_TIMEOUT)
+        self.meter = Meter()
+        self.backlog = Backlog(self.BACKLOG, overflow or self.OVERFLOW,
+                               os.path.join(self.SPOOL, 'spill'))
+        self.poller = zmq.Poller()
+        self.poller.register(self.pipe_receiver, zmq.POLLIN)
+        if self.control:
+            self.poller.register(self.control, zmq.POLLIN)
+        if self.METRICS_EVERY:
+            threading.Thread(target=self.publish, name='zbee-metrics',
+                             daemon=True).start()
+        if start:
+            self.run()
 
     def __del__(self):
-        self.context.destroy()
+        self.close()
+
+    def close(self):
+        '''
+        close our sockets only, the context may be the process-wide one.
+        '''
+        for socket in (self.pipe_receiver, self.semi, self.control):
+            if socket is not None and not socket.closed:
+                socket.close()
+
+    def _context(self):
+        return zmq.Context.instance()
+
+    def run(self):
+        '''
+        wake up on incoming messages or commands, or right away while some
+        are waiting in the backlog; answer commands first, then take a
+        batch in and handle a batch.
+        '''
+        while self.state != 'stopped':
+            timeout = 0 if self.backlog else self.POLL_TIMEOUT
+            events = dict(self.poller.poll(timeout))
+            if self.control in events:
+                self.answer()
+            if self.pipe_receiver in events and self.state == 'running':
+                self.drain()
+            self.work()
+            if self.state == 'draining' and not self.backlog:
+                self.state = 'stopped'
+        print(f'zbee stopped, {self.meter}')
+        self.close()
+
+    def answer(self):
+        '''
+        reply to whatever commands are waiting, without blocking.
+        '''
+        while self.control is not None and self.control.poll(0):
+            self.control.send(self.command(self.control.recv()))
+
+    def drain(self) -> int:
+        '''
+        move messages from the socket to the backlog.
+
+        :return: <int> messages taken, BATCH at most
+        '''
+        for n in range(self.BATCH):
+            # left in the socket, zmq's HWM pushes back on the sender
+            if self.backlog.full and self.backlog.policy == 'block':
+                return n
+            try:
+                frames = self.pipe_receiver.recv_multipart(zmq.NOBLOCK,
+                                                           copy=False)
+            except zmq.Again:
+                return n
+            self.meter.received += 1
+            self.backlog.put(frames)
+        return self.BATCH
+
+    def work(self) -> int:
+        '''
+        :return: <int> messages handled, BATCH at most
+        '''
+        for n in range(self.BATCH):
+            # a command waits one message at most
+            self.answer()
+            if self.state == 'stopped':
+                return n
+            frames = self.backlog.get()
+            if frames is None:
+                return n
+            self.receive(frames)
+        return self.BATCH
+
+    def receive(self, frames):
+        started = time.perf_counter()
+        try:
+            ok = self.handle(frames)
+        except Exception as e:
+            print(f'handle failed: {e}')
+            ok = False
+        self.meter.observe(time.perf_counter() - started, ok)
+
+    STAGES = ('unpackage', 'parse', 'package', 'deliver')
 
     def handle(self, data) -> bool:
-        data = self.unpackage(data)
-        parsed = self.parse(data)
-        payload = self.package(parsed)
-        result = self.deliver(payload)
-        print(f'payload delivered: {result}')
-        return result
+        received = None
+        try:
+            for stage in self.STAGES:
+                started = time.perf_counter()
+                data = getattr(self, stage)(data)
+                self.meter.time(stage, time.perf_counter() - started)
+                if data is PENDING:
+                    return True
+                if received is None:
+                    received = data
+            return data
+        finally:
+            # a spooled file is done with once delivered, or failed
+            self.spool.release(received)
+
+    def command(self, name) -> bytes:
+        '''
+        answer one out-of-band command, never queued behind data:
+            health      state and backlog depth
+            stats       everything in `stats`
+            drain       take no more messages, stop once the backlog's done
+            shutdown    stop now, backlogged messages in memory are lost
+
+        :param name: <bytes> one of COMMANDS
+        :return: <bytes> json reply, `ok` false for unknown commands
+        '''
+        name = bytes(name).decode(errors='replace').strip().lower()
+        if name not in self.COMMANDS:
+            return json.dumps({'ok': False,
+                               'error': f'unknown command {name!r}',
+                               'commands': self.COMMANDS}).encode()
+        if name == 'health':
+            self.hbee.healthCheck()
+        elif name in ('drain', 'shutdown') and self.state != 'stopped':
+            if self.state == 'running':
+                self.stopIntake()
+            self.state = 'draining' if name == 'drain' else 'stopped'
+
+        reply = {'ok': True, 'state': self.state, 'pid': os.getpid(),
+                 'backlog': len(self.backlog)}
+        if name == 'stats':
+            reply.update(self.stats())
+        return json.dumps(reply).encode()
+
+    def stopIntake(self):
+        self.poller.unregister(self.pipe_receiver)
+
+    def stats(self) -> dict:
+        return dict(self.meter.snapshot(),
+                    state=self.state,
+                    backlog=self.backlog.snapshot(),
+                    hwm={'snd': self.SNDHWM, 'rcv': self.RCVHWM},
+                    at=time.time())
+
+    def publish(self):
+        '''
+        runs in a thread, writes stats to zbee:metrics:IP:PID every
+        METRICS_EVERY seconds, kept three times as long.
+        '''
+        import redis
+        key = f'zbee:metrics:{self.IP}:{os.getpid()}'
+        while True:
+            time.sleep(self.METRICS_EVERY)
+            try:
+                self.r.set(key, json.dumps(self.stats()),
+                           ex=self.METRICS_EVERY * 3)
+            except redis.RedisError as e:
+                print(f'zbee metrics not published: {e}')
 
     def unpackage(self, data):
-        if isinstance(data, bytes):
-            data = data.decode()
+        '''
+        :param data: <list> of zmq.Frame, see utils.envelope
+        :return: <str> the string, or the local path of a received file,
+                       deleted once delivered; PENDING for a chunk of a
+                       file still on its way
+        '''
+        if isinstance(data, zmq.Frame):
+            data = [data]
+        if isinstance(data, list):
+            header, bodies = unseal(data)
+            if header is None:
+                # legacy single text frame, decoded off its buffer
+                data = bodies[0]
+            elif header['kind'] == 'string':
+                return header['string']
+            elif header['kind'] == 'drain' and self.hive:
+                # the hive's last word, behind all it has handed us
+                self.command(b'drain')
+                return PENDING
+            elif header['kind'] == 'chunk':
+                path = self.spool.add(header, bodies[0])
+                if path is None:
+                    return PENDING
+                self.spool.adopt(path)
+                return path
+            else:
+                return bodies[0] if len(bodies) == 1 else bodies
+        if isinstance(data, (bytes, memoryview)):
+            data = str(data, 'utf-8')
         return data
 
     def parse(self, data):
         return data
 
     def package(self, data):
-
-        if os.path.isfile(data):
+        '''
+        :return: frames, a json header then raw bodies;
+                 files go as a Stream, a message per chunk
+        '''
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            return seal({'kind': 'bytes'}, data)
+        elif os.path.isfile(data):
             if data.split('.')[-1] == 'mp4':
-                data = {"video": data}
+                return Stream(data, {'of': 'video'}, self.CHUNK_SIZE)
             else:
                 raise ZBeeError('only support mp4 now.')
         else:
-            data = {"string": data}
-
-        return data.__str__().replace("'", '"').encode()
+            return seal({'kind': 'string', 'string': data})
 
     def deliver(self, dealt_data) -> bool:
         flag = False
         try:
-            self.semi.send(dealt_data)
-            print(f'sent to {self.ZPIPE_OUT_PORT}: {dealt_data}')
+            if isinstance(dealt_data, (bytes, zmq.Frame)):
+                self.semi.send(dealt_data)
+            elif isinstance(dealt_data, Stream):
+                for frames in dealt_data:
+                    sendFrames(self.semi, frames)
+            else:
+                sendFrames(self.semi, dealt_data)
             flag = True
         except Exception as e:
             print(e)
             flag = False
         return flag
+
+
+def askAll(endpoints, name: str, timeout: int = 1000) -> list:
+    '''
+    send one command to many control sockets at once, see ZBee.command.
+
+    :param timeout: <int> milliseconds to wait for all the replies
+    :return: <list> of replies in the order of `endpoints`,
+                    None for those that didn't come in time
+    '''
+    context = zmq.Context.instance()
+    poller = zmq.Poller()
+    sockets = []
+    for endpoint in endpoints:
+        socket = context.socket(zmq.REQ)
+        # a busy bee still gets the command once it reads it
+        socket.setsockopt(zmq.LINGER, timeout)
+        socket.connect(endpoint.lstrip('>'))
+        socket.send(name.encode())
+        poller.register(socket, zmq.POLLIN)
+        sockets.append(socket)
+
+    replies = [None] * len(sockets)
+    pending = len(sockets)
+    deadline = time.monotonic() + timeout / 1000
+    try:
+        while pending and time.monotonic() < deadline:
+            left = (deadline - time.monotonic()) * 1000
+            for socket, _ in poller.poll(max(left, 0)):
+                replies[sockets.index(socket)] = json.loads(socket.recv())
+                poller.unregister(socket)
+                pending -= 1
+    finally:
+        for socket in sockets:
+            socket.close()
+    return replies
+
+
+def ask(endpoint: str, name: str, timeout: int = 1000) -> dict:
+    '''
+    askAll with one endpoint.
+
+    :return: <dict> the reply, `ok` false if none came
+    '''
+    reply, = askAll([endpoint], name, timeout)
+    return reply or {'ok': False, 'error': f'no reply from {endpoint}'}
+
+
+def _work(bee, hive, sink, control):
+    bee(hive=hive, sink=sink, control=control)
+
+
+class ZBeeHive():
+    '''
+    ZBee on many cores: a receiver spreading work over N worker bees,
+    a collector merging what they deliver.
+
+        source -> PULL | ROUTER @distribute -> N bees -> PULL @collect | PUSH -> sink
+
+    workers are `bee` processes on this host; bees on other hosts join with
+        bee(hive='tcp://HIVE_IP:DISTRIBUTE_PORT',
+            sink='>tcp://HIVE_IP:COLLECT_PORT')
+
+    messages go to the workers in turn, but every chunk of a streamed file
+    goes to the same one, which puts the file back together on its own
+    disk; nothing is shared between hosts but the sockets.
+
+    the hive answers ZBee's COMMANDS on its own control socket: health &
+    stats include every local worker's, each on a control port of its own
+    from WORKER_CONTROL_PORT, on localhost. shutdown is passed on to them,
+    drain goes down the pipe to every bee, remote ones too, behind what
+    they were handed, and a drained hive stops once its workers have done
+    all of it. workers are
+    asked all at once, for ASK_TIMEOUT ms at most, so that forwarding
+    never waits long; one busy in a long parse shows its last reply.
+
+    :param bee: a ZBee subclass, importable by module path
+    :param workers: <int> local worker processes, all cores by default
+    :param source: <str> same as ZBee's
+    :param sink: <str> same as ZBee's
+    :param control: <str> same as ZBee's
+    '''
+
+    DISTRIBUTE_PORT = 5560
+    COLLECT_PORT = 5561
+    WORKER_CONTROL_PORT = 5570
+    ASK_TIMEOUT = 200
+
+    def __init__(self, bee=ZBee, workers=None, source=None, sink=None,
+                 control=None):
+        source = source or f'@tcp://{ZBee.IP}:5557'
+        sink = sink or f'>tcp://{ZBee.IP}:5558'
+        if control is None:
+            control = f'@tcp://{ZBee.IP}:{ZBee.CONTROL_PORT}'
+        self.distribute = f'tcp://{ZBee.IP}:{self.DISTRIBUTE_PORT}'
+        self.collect = f'tcp://{ZBee.IP}:{self.COLLECT_PORT}'
+
+        self.context = zmq.Context.instance()
+        self.frontend = self.context.socket(zmq.PULL)
+        attach(self.frontend, source)
+        self.backend = self.context.socket(zmq.ROUTER)
+        # a gone worker raises, instead of its messages vanishing
+        self.backend.setsockopt(zmq.ROUTER_MANDATORY, 1)
+        self.backend.bind(self.distribute)
+        self.collector = self.context.socket(zmq.PULL)
+        self.collector.bind(self.collect)
+        self.outbound = self.context.socket(zmq.PUSH)
+        attach(self.outbound, sink)
+        self.control = None
+        if control:
+            self.control = self.context.socket(zmq.REP)
+            attach(self.control, control)
+        print(f'hive distributing on {self.distribute}, '
+              f'collecting on {self.collect}')
+
+        # fresh interpreters, zmq contexts don't survive a fork
+        spawn = multiprocessing.get_context('spawn')
+        self.controls = [f'tcp://127.0.0.1:{self.WORKER_CONTROL_PORT + i}'
+                         for i in range(workers or os.cpu_count())]
+        self.workers = [spawn.Process(target=_work,
+                                      args=(bee, self.distribute,
+                                            f'>{self.collect}',
+                                            f'@{endpoint}'),
+                                      daemon=True)
+                        for endpoint in self.controls]
+        for worker in self.workers:
+            worker.start()
+        print(f'{len(self.workers)} worker bees started.')
+
+        self.state = 'running'
+        self.forwarded = 0
+        # workers that probed, served in turn
+        self.peers = deque()
+        # stream id: {'peer': worker it's pinned to, 'touched': time}
+        self.pins = {}
+        self.swept = time.time()
+        # taken in while no worker was left to take it
+        self.held = deque()
+        # last reply of each worker
+        self.replies = [None] * len(self.workers)
+        self.run()
+
+    def run(self):
+        # the proxy stops on a TERMINATE sent through steer
+        steering = f'inproc://hive-steer-{id(self)}'
+        self.steer = self.context.socket(zmq.PAIR)
+        self.steer.bind(steering)
+        steered = self.context.socket(zmq.PAIR)
+        steered.connect(steering)
+        collecting = threading.Thread(target=zmq.proxy_steerable,
+                                      args=(self.collector, self.outbound,
+                                            None, steered),
+                                      daemon=True)
+        collecting.start()
+        self.poller = zmq.Poller()
+        self.poller.register(self.backend, zmq.POLLIN)
+        if self.control:
+            self.poller.register(self.control, zmq.POLLIN)
+
+        while self.state != 'stopped':
+            # nobody to hand messages to, they wait in the source's socket
+            intake = self.state == 'running' and self.peers and not self.held
+            self.poller.register(self.frontend, zmq.POLLIN if intake else 0)
+            events = dict(self.poller.poll(ZBee.POLL_TIMEOUT))
+            if self.backend in events:
+                self.greet()
+            if self.control in events:
+                self.control.send(self.command(self.control.recv()))
+            while self.held and self.peers and self.forward(self.held[0]):
+                self.held.popleft()
+            if self.frontend in events and intake:
+                for _ in range(ZBee.BATCH):
+                    try:
+                        frames = self.frontend.recv_multipart(zmq.NOBLOCK,
+                                                              copy=False)
+                    except zmq.Again:
+                        break
+                    if not self.forward(frames):
+                        self.held.append(frames)
+                        break
+            if self.state == 'draining' \
+                    and not any(w.is_alive() for w in self.workers):
+                self.settle()
+                self.state = 'stopped'
+
+        self.steer.send(b'TERMINATE')
+        collecting.join()
+        for socket in (steered, self.steer, self.collector, self.outbound,
+                       self.frontend, self.backend, self.control):
+            if socket is not None:
+                socket.close()
+        print('hive stopped.')
+
+    def settle(self, rounds=50):
+        '''
+        let the collector pass on what stopped workers left in it: wait
+        until it took nothing in for 0.1s, `rounds` times that at most.
+        '''
+        collected = None
+        for _ in range(rounds):
+            self.steer.send(b'STATISTICS')
+            # messages taken from the collector so far, first of 8 counters
+            now, = struct.unpack('=Q', self.steer.recv_multipart()[0])
+            if now == collected:
+                return
+            collected = now
+            time.sleep(0.1)
+
+    def greet(self):
+        '''
+        take in the probes workers send on (re)connecting.
+        '''
+        while True:
+            try:
+                peer, *_ = self.backend.recv_multipart(zmq.NOBLOCK)
+            except zmq.Again:
+                return
+            if peer not in self.peers:
+                self.peers.append(peer)
+
+    def forward(self, frames) -> bool:
+        '''
+        :return: <bool> False if there was no worker to take it
+        '''
+        header, _ = unseal(frames)
+        stream = header and header.get('kind') == 'chunk' \
+            and header.get('stream')
+        if not isinstance(stream, str):
+            if header and header.get('kind') == 'drain':
+                # only ever from the hive itself, see command
+                return True
+            while self.peers:
+                self.peers.rotate(-1)
+                if self.send(self.peers[-1], frames):
+                    self.forwarded += 1
+                    return True
+            return False
+
+        # a stream's chunks all go to one worker, which spools them
+        pin = self.pins.get(stream)
+        if pin is None:
+            if not self.peers:
+                return False
+            self.sweep()
+            self.peers.rotate(-1)
+            pin = self.pins[stream] = {'peer': self.peers[-1]}
+        pin['touched'] = time.time()
+        count = header.get('count')
+        if isinstance(count, int) and header.get('seq') == count - 1:
+            del self.pins[stream]
+        if pin['peer'] is not None and not self.send(pin['peer'], frames):
+            # the rest of it is of no use to anyone else
+            print(f'hive: stream {stream} lost along with its worker')
+            pin['peer'] = None
+        self.forwarded += 1
+        return True
+
+    def send(self, peer, frames) -> bool:
+        try:
+            self.backend.send_multipart([peer, *frames], copy=False)
+            return True
+        except zmq.ZMQError as e:
+            if e.errno != zmq.EHOSTUNREACH:
+                raise
+        # it probes again if it ever comes back
+        if peer in self.peers:
+            self.peers.remove(peer)
+        return False
+
+    def sweep(self):
+        '''
+        forget pins of streams quiet for longer than ZBee.SPOOL_TIMEOUT.
+        '''
+        now = time.time()
+        if now - self.swept < ZBee.SPOOL_TIMEOUT:
+            return
+        self.swept = now
+        for stream, pin in list(self.pins.items()):
+            if now - pin['touched'] > ZBee.SPOOL_TIMEOUT:
+                del self.pins[stream]
+
+    def command(self, name) -> bytes:
+        '''
+        same commands as ZBee.command, for the hive and its workers.
+        '''
+        name = bytes(name).decode(errors='replace').strip().lower()
+        if name not in ZBee.COMMANDS:
+            return json.dumps({'ok': False,
+                               'error': f'unknown command {name!r}',
+                               'commands': ZBee.COMMANDS}).encode()
+        if name == 'drain' and self.state == 'running':
+            self.state = 'draining'
+            for peer in list(self.peers):
+                self.send(peer, seal({'kind': 'drain'}))
+        elif name == 'shutdown':
+            self.state = 'stopped'
+        # drain went down the pipe, workers are only asked how they're doing
+        asked = 'health' if name == 'drain' else name
+
+        alive = [worker.is_alive() for worker in self.workers]
+        replies = askAll([endpoint for endpoint, up
+                          in zip(self.controls, alive) if up],
+                         asked, self.ASK_TIMEOUT)
+        workers = []
+        for i, up in enumerate(alive):
+            if not up:
+                workers.append({'ok': False, 'alive': False})
+                continue
+            reply = replies.pop(0)
+            if reply is None:
+                workers.append({'ok': False, 'alive': True,
+                                'error': 'busy, no reply in time',
+                                'last': self.replies[i]})
+                continue
+            self.replies[i] = reply
+            workers.append(dict(reply, alive=True))
+        reply = {'ok': True, 'state': self.state, 'pid': os.getpid(),
+                 'workers': workers}
+        if name == 'stats':
+            reply.update(forwarded=self.forwarded,
+                         held=len(self.held),
+                         peers=len(self.peers),
+                         streams=len(self.pins))
+        return json.dumps(reply).encode()